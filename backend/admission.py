@@ -0,0 +1,217 @@
+"""Admission control in front of the API.
+
+Public write endpoints get a token bucket per client IP and route: a client
+may burst up to the configured number of requests and then continues at the
+configured rate, and anything beyond is answered 429 with Retry-After before
+the body is read or the database touched. Limits are written "requests/seconds",
+e.g. RATE_LIMIT_RESERVATIONS=10/60; "off" disables one.
+
+RATE_LIMIT_STORE=memory (the default) keeps the buckets in process, which
+is enough for a single worker and costs no database write. With
+RATE_LIMIT_STORE=database, which serve.py sets when it starts more than one
+worker, the budgets live in the rate_limits table, so a client gets the
+configured limit in total however many workers serve it. The in-process
+buckets still sit in front of the table: a client that has used up its
+budget in this worker alone is turned away without a database round trip,
+and only requests they admit spend from the table.
+
+On top of that a global cap sheds load with 503 once MAX_CONCURRENT_REQUESTS
+are in flight, and a lower MAX_CONCURRENT_WRITES applies to non-GET requests,
+so a flood of submissions is turned away before menu reads start queueing.
+Rejections are counted in /metrics as http_requests_rejected_total.
+
+Behind a reverse proxy the client address comes from X-Forwarded-For: set
+TRUSTED_PROXY_HOPS to the number of proxies that append to it (1 on Render).
+"""
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from database import AsyncSessionLocal
+from metrics import registry
+from models import RateLimitDB
+
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "200"))
+MAX_CONCURRENT_WRITES = int(os.getenv("MAX_CONCURRENT_WRITES", "50"))
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+# Buckets kept at most, least recently used clients are forgotten first
+MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "50000"))
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+# Spent budgets are deleted once every this many database checks
+PRUNE_EVERY = 1000
+# Never shed: health checks, metrics and the long-lived admin event stream
+EXEMPT_PATHS = {"/health", "/health/db", "/metrics", "/reservations/events"}
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+class RateLimit:
+    def __init__(self, burst: int, period: float):
+        self.burst = burst
+        self.rate = burst / period  # tokens per second
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["RateLimit"]:
+        """"10/60" is a burst of 10 refilling over 60 seconds; "off" or "0" disables"""
+        if value.strip().lower() in ("", "off", "0"):
+            return None
+        burst, _, period = value.partition("/")
+        return cls(int(burst), float(period or 1))
+
+    def __repr__(self):
+        return f"RateLimit({self.burst}/{self.burst / self.rate:g}s)"
+
+RATE_LIMITS: Dict[Tuple[str, str], Optional[RateLimit]] = {
+    ("POST", "/reservations"): RateLimit.parse(os.getenv("RATE_LIMIT_RESERVATIONS", "10/60")),
+    ("POST", "/auth/login"): RateLimit.parse(os.getenv("RATE_LIMIT_LOGIN", "5/60")),
+}
+
+class TokenBuckets:
+    """Token buckets keyed by (route, client), bounded to max_clients entries"""
+
+    def __init__(self, max_clients: int = MAX_CLIENTS):
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+
+    def take(self, key: Tuple[str, str], limit: RateLimit) -> float:
+        """Spend a token, returning 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(limit.burst), now]
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / limit.rate
+
+class SharedBuckets:
+    """Token buckets in the rate_limits table, drawn on by every worker.
+
+    A bucket is stored as the time it will be full again (GCRA), so a single
+    conditional UPDATE both checks and spends a token and concurrent workers
+    cannot overspend it.
+    """
+
+    def __init__(self):
+        self.checks = 0
+
+    async def take(self, key: Tuple[str, str], limit: RateLimit) -> float:
+        """Spend a token, returning 0 on success or the seconds until one is available"""
+        row_key = " ".join(key)
+        now = time.time()
+        interval = 1 / limit.rate
+        tolerance = limit.burst * interval
+        start = case((RateLimitDB.tat > now, RateLimitDB.tat), else_=now)
+        async with AsyncSessionLocal() as db:
+            self.checks += 1
+            if self.checks % PRUNE_EVERY == 0:
+                await db.execute(delete(RateLimitDB).where(RateLimitDB.tat <= now))
+            result = await db.execute(
+                update(RateLimitDB)
+                .where(RateLimitDB.key == row_key, start + interval - now <= tolerance)
+                .values(tat=start + interval)
+            )
+            if result.rowcount == 1:
+                await db.commit()
+                return 0.0
+            tat = await db.scalar(select(RateLimitDB.tat).where(RateLimitDB.key == row_key))
+            if tat is not None:
+                await db.commit()
+                return tat + interval - tolerance - now
+            db.add(RateLimitDB(key=row_key, tat=now + interval))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker created the bucket first, spend from that one
+                return await self.take(key, limit)
+        return 0.0
+
+def client_address(scope, headers: Headers) -> str:
+    """The client IP, taken from X-Forwarded-For when behind TRUSTED_PROXY_HOPS proxies"""
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [part.strip() for part in headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        # Each trusted proxy appends the address it saw, so the client is that many entries from the end
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+async def reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the rate limits and concurrency caps"""
+
+    def __init__(
+        self,
+        app,
+        rate_limits: Dict[Tuple[str, str], Optional[RateLimit]] = RATE_LIMITS,
+        max_requests: int = MAX_CONCURRENT_REQUESTS,
+        max_writes: int = MAX_CONCURRENT_WRITES,
+    ):
+        self.app = app
+        self.rate_limits = {key: limit for key, limit in rate_limits.items() if limit is not None}
+        self.max_requests = max_requests
+        self.max_writes = max_writes
+        self.buckets = TokenBuckets()
+        self.shared = SharedBuckets() if RATE_LIMIT_STORE == "database" else None
+        self.in_flight = 0
+        self.writes_in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        # Exact paths: "/reservations/" only earns a cheap redirect, the request it leads to is the one counted
+        path = scope["path"]
+        if path in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.rate_limits.get((method, path))
+        if limit is not None:
+            client = client_address(scope, Headers(scope=scope))
+            wait = self.buckets.take((path, client), limit)
+            if not wait and self.shared is not None:
+                wait = await self.shared.take((path, client), limit)
+            if wait:
+                registry.reject("rate_limited", method, path)
+                await reject(send, 429, "Too many requests, please try again shortly", wait)
+                return
+
+        write = method not in READ_METHODS
+        if (self.max_requests and self.in_flight >= self.max_requests) or (
+            write and self.max_writes and self.writes_in_flight >= self.max_writes
+        ):
+            # Labelled by method only, so unmatched paths cannot inflate the label set
+            registry.reject("overloaded", method, "*")
+            await reject(send, 503, "Server is busy, please try again shortly", 1)
+            return
+
+        self.in_flight += 1
+        self.writes_in_flight += write
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self.writes_in_flight -= write
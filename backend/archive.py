@@ -0,0 +1,138 @@
+"""Move past and closed reservations out of the hot reservations table.
+
+A reservation is archived once its date is more than ARCHIVE_AFTER_DAYS in
+the past, or once it is rejected or cancelled and its date has passed. Rows
+are copied to reservations_archive and deleted in batches of BATCH_SIZE, one
+short transaction each, so memory use and lock time do not grow with the
+table. With ARCHIVE_EXPORT_DIR set (or --export) every archived batch is also
+appended to a gzip-compressed NDJSON file.
+
+    python archive.py                  # archive with the configured horizon
+    python archive.py --days 90 --export ./archive
+    python archive.py --dry-run        # count what would be archived
+"""
+import argparse
+import asyncio
+import gzip
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, async_engine
+from models import ReservationDB, ArchivedReservationDB, SlotOccupancyDB
+from schemas import ArchiveResult, ArchivedReservation
+import capacity
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_EXPORT_DIR = os.getenv("ARCHIVE_EXPORT_DIR")
+BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+COLUMNS = [column.name for column in ReservationDB.__table__.columns]
+
+def archivable(horizon: date, today: date):
+    """Rows past the horizon, or closed bookings whose day is over"""
+    return or_(
+        ReservationDB.date < horizon,
+        ReservationDB.status.in_(capacity.RELEASED_STATUSES) & (ReservationDB.date < today),
+    )
+
+class NDJSONExport:
+    """Appends archived rows to one gzip NDJSON file per run"""
+
+    def __init__(self, output_dir: str, started: datetime):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, f"reservations-{started.strftime('%Y%m%dT%H%M%S')}.ndjson.gz")
+        self.file = None
+
+    def write(self, rows, archived_at: datetime):
+        if self.file is None:
+            self.file = gzip.open(self.path, "at", encoding="utf-8")
+        for row in rows:
+            record = ArchivedReservation.model_validate(row).model_copy(update={"archived_at": archived_at})
+            self.file.write(record.model_dump_json() + "\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+async def archive_batch(db: AsyncSession, condition, archived_at: datetime, export: Optional[NDJSONExport]) -> int:
+    ids = (await db.scalars(
+        select(ReservationDB.id).where(condition).order_by(ReservationDB.id).limit(BATCH_SIZE)
+    )).all()
+    if not ids:
+        return 0
+    await db.execute(
+        insert(ArchivedReservationDB).from_select(
+            COLUMNS + ["archived_at"],
+            select(*[ReservationDB.__table__.c[name] for name in COLUMNS], literal(archived_at, DateTime))
+            .where(ReservationDB.id.in_(ids)),
+        )
+    )
+    rows = None
+    if export is not None:
+        rows = (await db.scalars(select(ReservationDB).where(ReservationDB.id.in_(ids)))).all()
+    await db.execute(delete(ReservationDB).where(ReservationDB.id.in_(ids)))
+    await db.commit()
+    if rows is not None:
+        export.write(rows, archived_at)
+    return len(ids)
+
+async def archive_reservations(
+    db: AsyncSession,
+    days: int = ARCHIVE_AFTER_DAYS,
+    export_dir: Optional[str] = ARCHIVE_EXPORT_DIR,
+    dry_run: bool = False,
+) -> ArchiveResult:
+    """Archive everything eligible, one committed batch at a time"""
+    today = date.today()
+    horizon = today - timedelta(days=days)
+    condition = archivable(horizon, today)
+    result = ArchiveResult(horizon=horizon.isoformat())
+    if dry_run:
+        result.archived = await db.scalar(select(func.count(ReservationDB.id)).where(condition))
+        return result
+
+    started = datetime.utcnow()
+    export = NDJSONExport(export_dir, started) if export_dir else None
+    try:
+        while True:
+            count = await archive_batch(db, condition, started, export)
+            if not count:
+                break
+            result.archived += count
+            result.batches += 1
+    finally:
+        if export is not None:
+            export.close()
+    if export is not None and export.file is not None:
+        result.export_path = export.path
+
+    # Occupancy for days before the horizon can no longer be booked against
+    await db.execute(delete(SlotOccupancyDB).where(SlotOccupancyDB.date < horizon.isoformat()))
+    await db.commit()
+    return result
+
+async def run(days: int, export_dir: Optional[str], dry_run: bool) -> ArchiveResult:
+    async with AsyncSessionLocal() as db:
+        result = await archive_reservations(db, days, export_dir, dry_run)
+    await async_engine.dispose()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive past and closed reservations")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="Archive bookings dated more than this many days ago (default $ARCHIVE_AFTER_DAYS or 180)")
+    parser.add_argument("--export", default=ARCHIVE_EXPORT_DIR, help="Also append archived rows to gzip NDJSON in this directory")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.days, args.export, args.dry_run))
+    if args.dry_run:
+        print(f"{result.archived} reservation(s) dated before {result.horizon} or closed would be archived")
+        return
+    print(f"Archived {result.archived} reservation(s) in {result.batches} batch(es)")
+    if result.export_path:
+        print(f"Exported to {result.export_path}")
+
+if __name__ == "__main__":
+    main()
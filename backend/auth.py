@@ -1,7 +1,7 @@
 import os
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from pydantic import BaseModel
@@ -15,9 +15,12 @@ if not ADMIN_PASSWORD:
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours
+STREAM_TOKEN_EXPIRE_SECONDS = 60  # only checked when an event stream connects
+STREAM_SCOPE = "events"
 
 # Security scheme
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Pydantic models
 class AdminLoginRequest(BaseModel):
@@ -28,6 +31,10 @@ class AdminLoginResponse(BaseModel):
     message: str
     token: Optional[str] = None
 
+class StreamTokenResponse(BaseModel):
+    token: str
+    expires_in: int
+
 class TokenData(BaseModel):
     admin: bool
 
@@ -39,6 +46,15 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_stream_token() -> str:
+    """Short-lived token for EventSource, which cannot send an Authorization header.
+
+    It carries no admin claim and a scope that verify_token refuses, so a token
+    leaked from a URL opens the event stream and nothing else.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    return jwt.encode({"scope": STREAM_SCOPE, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
 # Token verification
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
     """Verify JWT token from Authorization header"""
@@ -46,7 +62,8 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         admin: bool = payload.get("admin")
-        if admin is None:
+        # Scoped tokens are only good for what their scope names
+        if admin is None or "scope" in payload:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication credentials",
@@ -70,6 +87,25 @@ def verify_admin_token(token_data: TokenData = Depends(verify_token)) -> bool:
         )
     return True
 
+def verify_stream_access(
+    token: Optional[str] = Query(None, description="Stream token from POST /reservations/events/token"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> bool:
+    """Admin access to an event stream, from the Authorization header or a stream token in the URL"""
+    if credentials is not None:
+        return verify_admin_token(verify_token(credentials))
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]) if token else {}
+    except JWTError:
+        payload = {}
+    # Only stream tokens are accepted here, so a long-lived admin token never ends up in a URL
+    if payload.get("scope") != STREAM_SCOPE:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    return True
+
 # Legacy password verification (for login endpoint)
 def verify_password(password: str) -> bool:
     """Verify password matches admin password"""
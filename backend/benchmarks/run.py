@@ -0,0 +1,292 @@
+"""Offline load test for the Dosa Spot API.
+
+Boots the app with uvicorn against a throwaway SQLite database seeded from
+data/menu.json plus synthetic reservations, drives a mixed workload and writes
+per-endpoint throughput, latency percentiles and bytes on the wire, plus the
+server's CPU time per request, to a JSON file.
+
+    cd backend
+    python -m benchmarks.run --rows 1000,100000 --duration 30 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_PASSWORD = "benchmark"
+
+# Relative weights of each operation in the traffic mix
+WORKLOAD = {
+    "GET /menu": 40,
+    "GET /banners": 20,
+    "POST /reservations": 10,
+    "GET /reservations (admin page)": 15,
+    "GET /reservations/calendar": 10,
+    "GET /reservations/calendar/{day}": 5,
+}
+
+STATUSES = (("confirmed", 60), ("pending", 25), ("cancelled", 15))
+BOOKING_TYPES = (("table", 80), ("private_event", 12), ("catering", 8))
+TIMES = [f"{hour:02d}:{minute:02d}" for hour in range(11, 22) for minute in (0, 30)]
+
+def weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def insert_reservations(db_path: str, rows: int, rng: random.Random, today: date):
+    """Bulk-insert synthetic bookings spread over two years back and three months ahead"""
+    conn = sqlite3.connect(db_path)
+    start = today - timedelta(days=730)
+    span = 730 + 90
+
+    def generate():
+        for i in range(rows):
+            day = start + timedelta(days=rng.randrange(span))
+            created = datetime.combine(day, datetime.min.time()) - timedelta(days=rng.randrange(30), seconds=rng.randrange(86400))
+            yield (
+                f"Guest {i}", f"guest{i}@example.com", "613-555-0100",
+                day.isoformat(), rng.choice(TIMES), rng.randint(1, 12),
+                weighted(rng, STATUSES), created.isoformat(sep=" "), weighted(rng, BOOKING_TYPES),
+            )
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO reservations (name, email, phone, date, time, guests, status, created_at, booking_type) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            generate(),
+        )
+    conn.close()
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+class Server:
+    """uvicorn subprocess bound to a temporary database"""
+
+    def __init__(self, db_path: str, port: int):
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "ADMIN_PASSWORD": ADMIN_PASSWORD,
+            "JWT_SECRET_KEY": "benchmark-secret",
+            # All traffic comes from one address, which the per-client limit would throttle
+            "RATE_LIMIT_RESERVATIONS": "off",
+        })
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("API server did not become ready")
+
+    def cpu_seconds(self) -> float:
+        """User plus system CPU time of the server process so far (Linux only, else 0)"""
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return 0.0
+        # utime and stime are fields 14 and 15 of stat, counted after the ")" of the command name
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+async def drive(base_url: str, duration: float, concurrency: int, seed: int, today: date, accept_encoding: str):
+    samples = {name: [] for name in WORKLOAD}
+    wire_bytes = {name: 0 for name in WORKLOAD}
+    errors = {name: 0 for name in WORKLOAD}
+    names = list(WORKLOAD)
+    weights = [WORKLOAD[name] for name in names]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    headers = {"Accept-Encoding": accept_encoding}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30, headers=headers) as client:
+        login = await client.post("/auth/login", json={"password": ADMIN_PASSWORD})
+        admin = {"Authorization": f"Bearer {login.json()['token']}"}
+
+        async def request(name: str, rng: random.Random):
+            day = today + timedelta(days=rng.randint(-60, 60))
+            if name == "GET /menu":
+                return await client.get("/menu")
+            if name == "GET /banners":
+                return await client.get("/banners")
+            if name == "POST /reservations":
+                return await client.post("/reservations", json={
+                    "name": "Load Test", "email": "load@example.com", "phone": "613-555-0199",
+                    "date": day.isoformat(), "time": rng.choice(TIMES), "guests": rng.randint(1, 8),
+                })
+            if name == "GET /reservations (admin page)":
+                return await client.get("/reservations", headers=admin, params={
+                    "status": "pending", "date_from": today.isoformat(), "limit": 50, "order": "desc",
+                })
+            if name == "GET /reservations/calendar":
+                return await client.get("/reservations/calendar", headers=admin, params={"month": day.strftime("%Y-%m")})
+            return await client.get(f"/reservations/calendar/{day.isoformat()}", headers=admin)
+
+        async def worker(worker_id: int, deadline: float):
+            rng = random.Random(seed * 1000 + worker_id)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights=weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await request(name, rng)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                if ok:
+                    samples[name].append(elapsed)
+                    wire_bytes[name] += response.num_bytes_downloaded
+                else:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker(i, deadline) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors[name],
+            "throughput_rps": round(len(latencies) / wall, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "avg_bytes": round(wire_bytes[name] / len(latencies)) if latencies else 0,
+        }
+    total = sum(item["requests"] for item in endpoints.values())
+    return {
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(total / wall, 2),
+        "requests": total,
+        "bytes": sum(wire_bytes.values()),
+        "endpoints": endpoints,
+    }
+
+def run_scenario(rows: int, args) -> dict:
+    rng = random.Random(args.seed)
+    today = date.today()
+    with tempfile.TemporaryDirectory(prefix="dosa-bench-") as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        server = Server(db_path, free_port())
+        try:
+            # First boot creates the schema and seeds the menu from data/menu.json
+            server.wait_ready()
+            setup_started = time.perf_counter()
+            insert_reservations(db_path, rows, rng, today)
+            setup_seconds = time.perf_counter() - setup_started
+            if args.warmup:
+                asyncio.run(drive(server.base_url, args.warmup, args.concurrency, args.seed + 1, today, args.accept_encoding))
+            cpu_before = server.cpu_seconds()
+            result = asyncio.run(drive(server.base_url, args.duration, args.concurrency, args.seed, today, args.accept_encoding))
+            cpu_seconds = server.cpu_seconds() - cpu_before
+        finally:
+            server.stop()
+    result.update({
+        "rows": rows,
+        "setup_seconds": round(setup_seconds, 3),
+        "server_cpu_seconds": round(cpu_seconds, 3),
+        "cpu_ms_per_request": round(cpu_seconds * 1000 / result["requests"], 3) if result["requests"] else 0,
+    })
+    return result
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_report(scenario: dict):
+    print(
+        f"\n{scenario['rows']:,} reservations: {scenario['throughput_rps']} req/s overall, "
+        f"{scenario['cpu_ms_per_request']} ms server CPU per request, {scenario['bytes']:,} bytes received"
+    )
+    print(f"{'endpoint':40} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'bytes':>9} {'errors':>7}")
+    for name, stats in scenario["endpoints"].items():
+        print(
+            f"{name:40} {stats['throughput_rps']:>9} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+            f"{stats['p99_ms']:>9} {stats['avg_bytes']:>9} {stats['errors']:>7}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Dosa Spot API load benchmark")
+    parser.add_argument("--rows", default="1000", help="Comma-separated reservation volumes, e.g. 1000,100000,1000000")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured warm-up seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for data and traffic generation")
+    parser.add_argument("--accept-encoding", default="br, gzip", help="Accept-Encoding sent by the clients (identity to disable compression)")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    scenarios = []
+    for rows in (int(value) for value in args.rows.split(",")):
+        scenario = run_scenario(rows, args)
+        print_report(scenario)
+        scenarios.append(scenario)
+
+    output = args.output or os.path.join(
+        BACKEND_DIR, "benchmarks", "results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "accept_encoding": args.accept_encoding,
+            "workload": WORKLOAD,
+            "scenarios": scenarios,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
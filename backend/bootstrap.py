@@ -0,0 +1,78 @@
+import hashlib
+import os
+from typing import Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from database import engine, Base, SessionLocal, DATA_DIR
+from models import AppMetadataDB
+
+SCHEMA_KEY = "schema_version"
+MENU_KEY = "menu_hash"
+# The menu.json text last applied, which the next version is diffed against
+MENU_DOCUMENT_KEY = "menu_document"
+OCCUPANCY_KEY = "occupancy_keying"
+
+def schema_fingerprint() -> str:
+    """Hash of the DDL the current models would emit on this database"""
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda idx: idx.name):
+            digest.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    return digest.hexdigest()
+
+def menu_fingerprint() -> str:
+    """Hash of data/menu.json, or of nothing when it is missing and the fallback menu is used"""
+    digest = hashlib.sha256()
+    path = os.path.join(DATA_DIR, "menu.json")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def get_metadata(key: str) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        row = db.get(AppMetadataDB, key)
+        return row.value if row else None
+    except SQLAlchemyError:
+        # Metadata table does not exist yet
+        return None
+    finally:
+        db.close()
+
+def set_metadata(key: str, value: str):
+    db = SessionLocal()
+    try:
+        db.merge(AppMetadataDB(key=key, value=value))
+        db.commit()
+    finally:
+        db.close()
+
+def add_missing_columns():
+    """Add nullable columns that exist on the models but not yet in older databases"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+
+def ensure_schema() -> bool:
+    """Run DDL only when the models changed since the last recorded schema version"""
+    fingerprint = schema_fingerprint()
+    if get_metadata(SCHEMA_KEY) == fingerprint:
+        return False
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    # create_all skips indexes on tables that already exist, so add any new ones explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    set_metadata(SCHEMA_KEY, fingerprint)
+    return True
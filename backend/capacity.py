@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Set
+from sqlalchemy import select, update, delete, func, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import DATA_DIR, async_engine
+from models import ReservationDB, SlotOccupancyDB
+from schemas import Availability, SlotAvailability
+from dates import format_date, parse_time
+
+CAPACITY_FILE = os.path.join(DATA_DIR, "capacity.json")
+# Bookings in these statuses no longer hold a seat
+RELEASED_STATUSES = {"rejected", "cancelled"}
+DAY_SLOT = ""
+
+class CapacityError(Exception):
+    pass
+
+@dataclass
+class BookingRule:
+    per: str = "slot"  # "slot" or "day"
+    max_guests: Optional[int] = None
+    max_bookings: Optional[int] = None
+    max_party_size: Optional[int] = None
+
+@dataclass
+class CapacityConfig:
+    slot_minutes: int = 30
+    service_start: str = "11:00"
+    service_end: str = "22:00"
+    blackout_dates: Set[str] = field(default_factory=set)
+    booking_types: Dict[str, BookingRule] = field(default_factory=dict)
+
+    def rule_for(self, booking_type: Optional[str]) -> BookingRule:
+        # Unknown booking types are tracked but not limited
+        return self.booking_types.get(booking_type or "table", BookingRule())
+
+    def service_slots(self) -> List[str]:
+        start = datetime.strptime(self.service_start, "%H:%M")
+        end = datetime.strptime(self.service_end, "%H:%M")
+        slots = []
+        while start < end:
+            slots.append(start.strftime("%H:%M"))
+            start += timedelta(minutes=self.slot_minutes)
+        return slots
+
+    def fingerprint(self) -> str:
+        """Changes whenever occupancy rows would be keyed differently"""
+        keying = {"slot_minutes": self.slot_minutes, "per": {name: rule.per for name, rule in sorted(self.booking_types.items())}}
+        return hashlib.sha256(json.dumps(keying, sort_keys=True).encode()).hexdigest()
+
+def load_config(path: str = CAPACITY_FILE) -> CapacityConfig:
+    """Read capacity rules, a missing file means no limits"""
+    if not os.path.exists(path):
+        return CapacityConfig()
+    with open(path, "r") as f:
+        data = json.load(f)
+    hours = data.get("service_hours", {})
+    return CapacityConfig(
+        slot_minutes=data.get("slot_minutes", 30),
+        service_start=hours.get("start", "11:00"),
+        service_end=hours.get("end", "22:00"),
+        blackout_dates=set(data.get("blackout_dates", [])),
+        booking_types={name: BookingRule(**rule) for name, rule in data.get("booking_types", {}).items()},
+    )
+
+config = load_config()
+SERVICE_SLOTS = config.service_slots()
+
+def holds_capacity(status: Optional[str]) -> bool:
+    return status not in RELEASED_STATUSES
+
+def slot_for(rule: BookingRule, booking_time: Optional[time]) -> str:
+    """Round a booking time down to the start of its slot"""
+    if rule.per == "day":
+        return DAY_SLOT
+    try:
+        parsed = parse_time(booking_time)
+    except ValueError:
+        return ""
+    minutes = parsed.hour * 60 + parsed.minute
+    minutes -= minutes % config.slot_minutes
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def insert_ignore():
+    dialect = postgresql if async_engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(SlotOccupancyDB)
+
+async def claim(db: AsyncSession, booking_date: date, booking_time: time, booking_type: Optional[str], guests: int):
+    """Atomically take capacity for one booking inside the caller's transaction.
+
+    The conditional UPDATE both checks and increments the counters, so two
+    concurrent bookings can never both take the last seats.
+    """
+    booking_type = booking_type or "table"
+    day = format_date(booking_date)
+    if day in config.blackout_dates:
+        raise CapacityError("Reservations are not available on this date")
+    rule = config.rule_for(booking_type)
+    if rule.max_party_size is not None and guests > rule.max_party_size:
+        raise CapacityError(f"Party size is limited to {rule.max_party_size} guests")
+
+    slot = slot_for(rule, booking_time)
+    await db.execute(
+        insert_ignore()
+        .values(date=day, slot=slot, booking_type=booking_type, guests=0, bookings=0)
+        .on_conflict_do_nothing()
+    )
+    stmt = (
+        update(SlotOccupancyDB)
+        .where(
+            SlotOccupancyDB.date == day,
+            SlotOccupancyDB.slot == slot,
+            SlotOccupancyDB.booking_type == booking_type,
+        )
+        .values(guests=SlotOccupancyDB.guests + guests, bookings=SlotOccupancyDB.bookings + 1)
+    )
+    if rule.max_guests is not None:
+        stmt = stmt.where(SlotOccupancyDB.guests + guests <= rule.max_guests)
+    if rule.max_bookings is not None:
+        stmt = stmt.where(SlotOccupancyDB.bookings + 1 <= rule.max_bookings)
+    result = await db.execute(stmt)
+    if result.rowcount != 1:
+        raise CapacityError("This time is fully booked")
+
+async def release(db: AsyncSession, booking_date: date, booking_time: time, booking_type: Optional[str], guests: int):
+    """Give a booking's capacity back inside the caller's transaction"""
+    booking_type = booking_type or "table"
+    day = format_date(booking_date)
+    slot = slot_for(config.rule_for(booking_type), booking_time)
+    await db.execute(
+        update(SlotOccupancyDB)
+        .where(
+            SlotOccupancyDB.date == day,
+            SlotOccupancyDB.slot == slot,
+            SlotOccupancyDB.booking_type == booking_type,
+        )
+        .values(
+            guests=case((SlotOccupancyDB.guests > guests, SlotOccupancyDB.guests - guests), else_=0),
+            bookings=case((SlotOccupancyDB.bookings > 0, SlotOccupancyDB.bookings - 1), else_=0),
+        )
+    )
+
+async def availability(db: AsyncSession, day: str, booking_type: str, guests: int) -> Availability:
+    """Answer from the occupancy rows of one day, independent of reservation volume"""
+    rule = config.rule_for(booking_type)
+    blackout = day in config.blackout_dates
+    result = await db.execute(
+        select(SlotOccupancyDB).where(SlotOccupancyDB.date == day, SlotOccupancyDB.booking_type == booking_type)
+    )
+    occupancy = {row.slot: row for row in result.scalars()}
+    party_fits = rule.max_party_size is None or guests <= rule.max_party_size
+
+    slots = []
+    for slot in ([DAY_SLOT] if rule.per == "day" else SERVICE_SLOTS):
+        row = occupancy.get(slot)
+        booked_guests = row.guests if row else 0
+        booked_bookings = row.bookings if row else 0
+        remaining_guests = None if rule.max_guests is None else max(rule.max_guests - booked_guests, 0)
+        remaining_bookings = None if rule.max_bookings is None else max(rule.max_bookings - booked_bookings, 0)
+        available = (
+            not blackout and party_fits
+            and (remaining_guests is None or remaining_guests >= guests)
+            and (remaining_bookings is None or remaining_bookings >= 1)
+        )
+        slots.append(SlotAvailability(
+            time=slot or None,
+            booked_guests=booked_guests,
+            booked_bookings=booked_bookings,
+            remaining_guests=remaining_guests,
+            remaining_bookings=remaining_bookings,
+            available=available,
+        ))
+    return Availability(date=day, booking_type=booking_type, blackout=blackout, slots=slots)
+
+def rebuild_occupancy(db: Session):
+    """Recompute every occupancy row from the reservations table, the caller commits"""
+    totals = defaultdict(lambda: [0, 0])
+    rows = db.execute(
+        select(ReservationDB.date, ReservationDB.time, ReservationDB.booking_type,
+               func.count(ReservationDB.id), func.coalesce(func.sum(ReservationDB.guests), 0))
+        .where(ReservationDB.status.notin_(RELEASED_STATUSES) | ReservationDB.status.is_(None))
+        .where(ReservationDB.date.is_not(None))
+        .group_by(ReservationDB.date, ReservationDB.time, ReservationDB.booking_type)
+    )
+    for booking_date, booking_time, booking_type, count, guests in rows:
+        booking_type = booking_type or "table"
+        key = (format_date(booking_date), slot_for(config.rule_for(booking_type), booking_time), booking_type)
+        totals[key][0] += guests
+        totals[key][1] += count
+    db.execute(delete(SlotOccupancyDB))
+    if totals:
+        db.execute(SlotOccupancyDB.__table__.insert(), [
+            {"date": day, "slot": slot, "booking_type": booking_type, "guests": guests, "bookings": bookings}
+            for (day, slot, booking_type), (guests, bookings) in totals.items()
+        ])
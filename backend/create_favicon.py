@@ -1,8 +1,9 @@
 from PIL import Image
 import os
 
-source_path = '/Users/arpitm/Multiverse/Chaos/PWAs/dosa-point/frontend/public/android-chrome-512x512.png'
-dest_path = '/Users/arpitm/Multiverse/Chaos/PWAs/dosa-point/frontend/public/favicon_white.png'
+public_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'public')
+source_path = os.path.join(public_dir, 'android-chrome-512x512.png')
+dest_path = os.path.join(public_dir, 'favicon_white.png')
 
 if os.path.exists(source_path):
     img = Image.open(source_path).convert("RGBA")
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -16,15 +18,61 @@ DATABASE_URL = os.getenv(
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+def to_async_url(url: str):
+    """Map the sync DATABASE_URL onto the matching async driver"""
+    db_url = make_url(url)
+    connect_args = {}
+    if db_url.get_backend_name() == "postgresql":
+        # asyncpg does not understand libpq's sslmode, it takes an ssl argument instead
+        sslmode = db_url.query.get("sslmode")
+        if sslmode:
+            db_url = db_url.difference_update_query(["sslmode"])
+            connect_args["ssl"] = sslmode
+        db_url = db_url.set(drivername="postgresql+asyncpg")
+    else:
+        db_url = db_url.set(drivername="sqlite+aiosqlite")
+    return db_url, connect_args
+
+ASYNC_DATABASE_URL, _async_connect_args = to_async_url(DATABASE_URL)
+
+# "production" enables WAL and tuned pragmas on every SQLite connection, "development" keeps SQLite defaults
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # readers never block the writer and vice versa
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),  # wait for the write lock instead of failing
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # durable in WAL mode, fsync only at checkpoints
+    "cache_size": str(-int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))),  # negative means KiB
+    "mmap_size": str(int(os.getenv("SQLITE_MMAP_SIZE_MB", "256")) * 1024 * 1024),
+    "temp_store": "MEMORY",
+}
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 # Create engine with appropriate settings
 if DATABASE_URL.startswith("postgresql"):
     # PostgreSQL configuration
     engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, connect_args=_async_connect_args)
+elif SQLITE_PROFILE == "production" and make_url(DATABASE_URL).database not in (None, "", ":memory:"):
+    # SQLite configuration for a single-node deployment: a pool of WAL connections for concurrent readers
+    pool_options = {"pool_size": SQLITE_POOL_SIZE, "max_overflow": SQLITE_POOL_SIZE, "pool_timeout": 30}
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **pool_options)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options)
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
 else:
     # SQLite configuration (for local development)
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit so routes can return them without another round-trip
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -33,3 +81,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def database_health() -> dict:
+    """Round-trip the async engine and report the settings actually in effect"""
+    report = {"dialect": async_engine.dialect.name, "pool": async_engine.pool.status()}
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        if async_engine.dialect.name == "sqlite":
+            report["profile"] = SQLITE_PROFILE
+            report["pragmas"] = {
+                name: (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+                for name in SQLITE_PRAGMAS
+            }
+    return report
@@ -0,0 +1,44 @@
+from datetime import date, datetime, time
+from typing import Optional, Union
+
+# Older bookings were stored as whatever text the client sent, these cover what shows up in practice
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d.%m.%Y")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p", "%I%p")
+
+def parse_date(value: Union[str, date, None]) -> date:
+    """Booking date from an ISO string (or a legacy format), raising ValueError otherwise"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = (value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+def parse_time(value: Union[str, time, None]) -> time:
+    """Booking time from HH:MM (or a legacy format such as 7:30 PM), raising ValueError otherwise"""
+    if isinstance(value, time):
+        return value
+    text = (value or "").strip().upper()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time {value!r}, expected HH:MM")
+
+def format_date(value: Optional[date]) -> str:
+    return value.isoformat() if value is not None else ""
+
+def format_time(value: Optional[time]) -> str:
+    """HH:MM like the booking form sends, seconds only when there are any"""
+    if value is None:
+        return ""
+    return value.strftime("%H:%M:%S" if value.second else "%H:%M")
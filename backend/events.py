@@ -0,0 +1,150 @@
+"""Server-sent events for the admin dashboard, delivered by every worker.
+
+A change is recorded in the reservation_events table in the same transaction
+that makes it, so an event exists exactly when its change was committed. While
+anyone is subscribed to a worker, that worker's hub reads the rows past the
+last one it delivered every EVENT_POLL_SECONDS and fans them out; the worker
+that made the change wakes its own hub after the commit instead of waiting for
+the next poll. Row ids double as SSE ids, and rows are kept for
+EVENT_RETENTION_SECONDS.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import ReservationEventDB
+
+HEARTBEAT_SECONDS = 15
+POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "1"))
+RETENTION = timedelta(seconds=int(os.getenv("EVENT_RETENTION_SECONDS", "3600")))
+# Ids are handed out at insert, so a later id can commit first; a missing one is
+# waited for this long before it is taken for a rolled back transaction
+GAP_SECONDS = 10
+# Expired rows are deleted once every this many polls
+PRUNE_EVERY = 600
+
+class EventHub:
+    """Per-worker hub fanning out the recorded events to this worker's subscribers"""
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        # Every id up to last_id has been delivered or given up on; None until the first poll
+        self.last_id: Optional[int] = None
+        self.delivered: Set[int] = set()
+        self.gaps: Dict[int, float] = {}
+        self.polls = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def record(self, db: AsyncSession, event: str, data: dict):
+        """Add an event to the caller's transaction; call notify() once it has committed"""
+        db.add(ReservationEventDB(event=event, data=json.dumps(data, default=str)))
+
+    def notify(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run(self):
+        """Poll for new events for as long as this worker has subscribers"""
+        self.last_id = None
+        while self.subscribers:
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"Reading reservation events failed: {e}")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    async def poll(self):
+        async with AsyncSessionLocal() as db:
+            if self.last_id is None:
+                # Subscribers get what happens from now on, not the backlog
+                self.last_id = await db.scalar(select(func.max(ReservationEventDB.id))) or 0
+                self.delivered.clear()
+                self.gaps.clear()
+                return
+            rows = (await db.execute(
+                select(ReservationEventDB.id, ReservationEventDB.event, ReservationEventDB.data)
+                .where(ReservationEventDB.id > self.last_id)
+                .order_by(ReservationEventDB.id)
+            )).all()
+            self.polls += 1
+            if self.polls % PRUNE_EVERY == 0:
+                await db.execute(delete(ReservationEventDB).where(ReservationEventDB.created_at < datetime.utcnow() - RETENTION))
+                await db.commit()
+        for row in rows:
+            if row.id not in self.delivered:
+                self.delivered.add(row.id)
+                self.broadcast(f"id: {row.id}\nevent: {row.event}\ndata: {row.data}\n\n")
+        self.advance()
+
+    def advance(self):
+        """Move last_id over delivered ids, and over missing ones once they are old enough"""
+        now = time.monotonic()
+        top = max(self.delivered, default=self.last_id)
+        for missing in range(self.last_id + 1, top):
+            if missing not in self.delivered:
+                self.gaps.setdefault(missing, now)
+        while self.last_id < top:
+            next_id = self.last_id + 1
+            if next_id in self.delivered:
+                self.delivered.discard(next_id)
+            elif now - self.gaps[next_id] >= GAP_SECONDS:
+                del self.gaps[next_id]
+            else:
+                break
+            self.last_id = next_id
+
+    def broadcast(self, message: str):
+        # Formatted once, every subscriber gets the same bytes
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A dashboard that stopped reading is dropped instead of holding memory;
+                # the admin page reconnects with a fresh stream token and refetches
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream(self, queue: asyncio.Queue, is_disconnected):
+        """Yield SSE messages from a subscription until the client goes away"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message: Optional[str] = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(queue)
+
+reservation_events = EventHub()
@@ -0,0 +1,19 @@
+import json
+import os
+from typing import Any
+
+def write_atomic(path: str, data: bytes):
+    """Write to a temporary file and rename it into place, so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def read_json(path: str, default: Any) -> Any:
+    """Parsed JSON file, or default when it is missing or unreadable"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
@@ -0,0 +1,179 @@
+"""Replay protection for reservation requests.
+
+A request sent with an Idempotency-Key header is carried out once; repeating
+the key within IDEMPOTENCY_TTL_SECONDS returns the stored response without
+touching the reservations table. Requests without a key are matched on a
+fingerprint of their body for the shorter IDEMPOTENCY_FINGERPRINT_TTL_SECONDS,
+which catches double taps and retries from clients that send no key. Reusing
+a key for a different request is rejected with 422. A repeat that arrives
+while the first request is still running waits for it in the same worker; in
+another worker the two race to commit the key, and the loser is answered with
+the winner's response.
+
+IDEMPOTENCY_STORE=memory keeps keys in a bounded in-process LRU, which is
+enough for a single worker. IDEMPOTENCY_STORE=database (the default) records
+them in the idempotency_keys table so all workers share them; completed
+responses are also cached in memory, so a retry storm costs a dict lookup.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import IdempotencyKeyDB
+
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "database")
+KEY_TTL = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+FINGERPRINT_TTL = int(os.getenv("IDEMPOTENCY_FINGERPRINT_TTL_SECONDS", "120"))
+MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+MAX_KEY_LENGTH = 255
+# Expired rows are deleted once every this many new keys
+PRUNE_EVERY = 500
+
+class IdempotencyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: bytes
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def request_key(scope: str, idempotency_key: Optional[str], request_fingerprint: str) -> Tuple[str, int]:
+    """Store key and TTL for a request, from its Idempotency-Key or else its fingerprint"""
+    if idempotency_key is None:
+        return f"{scope}:body:{request_fingerprint}", FINGERPRINT_TTL
+    idempotency_key = idempotency_key.strip()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    return f"{scope}:key:{idempotency_key}", KEY_TTL
+
+def matching(stored: StoredResponse, request_fingerprint: str) -> StoredResponse:
+    if stored.fingerprint != request_fingerprint:
+        raise IdempotencyError(422, "Idempotency-Key was already used for a different request")
+    return stored
+
+class MemoryStore:
+    """Bounded in-process store: an LRU of completed responses plus in-flight requests"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, StoredResponse]]" = OrderedDict()
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    def cached(self, key: str) -> Optional[StoredResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, stored = entry
+        if expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return stored
+
+    def remember(self, key: str, stored: StoredResponse, ttl: int):
+        self.entries[key] = (time.monotonic() + ttl, stored)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def settle(self, key: str):
+        future = self.pending.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def claim(self, key: str, request_fingerprint: str, ttl: int) -> Optional[StoredResponse]:
+        """Return the stored response for key, or claim key for this request and return None"""
+        while True:
+            stored = self.cached(key)
+            if stored is not None:
+                return matching(stored, request_fingerprint)
+            future = self.pending.get(key)
+            if future is None:
+                break
+            # The first request with this key is still running in this worker, wait for its answer
+            await asyncio.shield(future)
+        self.pending[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def record(self, db: AsyncSession, key: str, stored: StoredResponse, ttl: int):
+        """Add the response to the caller's transaction; nothing to do when keys live in memory"""
+
+    async def lookup(self, key: str) -> Optional[StoredResponse]:
+        """The response committed for key by another request, after a conflicting insert"""
+        return self.cached(key)
+
+    async def complete(self, key: str, stored: StoredResponse, ttl: int):
+        """Called once the transaction holding the response has committed"""
+        self.remember(key, stored, ttl)
+        self.settle(key)
+
+    async def release(self, key: str):
+        """Give up a claim without a response, so the next attempt runs normally"""
+        self.settle(key)
+
+class DatabaseStore(MemoryStore):
+    """Keys in the idempotency_keys table, shared by all workers, with a local cache in front.
+
+    The row is inserted in the same transaction as the reservation, so a booking
+    costs no extra commit, and the primary key settles a race between workers:
+    the loser's transaction fails and it replays the winner's response instead.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        super().__init__(max_entries)
+        self.lookups = 0
+
+    async def claim(self, key: str, request_fingerprint: str, ttl: int) -> Optional[StoredResponse]:
+        stored = await super().claim(key, request_fingerprint, ttl)
+        if stored is not None:
+            return stored
+        try:
+            stored = await self.load(key)
+        except BaseException:
+            self.settle(key)
+            raise
+        if stored is not None:
+            self.remember(key, stored, ttl)
+            self.settle(key)
+            return matching(stored, request_fingerprint)
+        return None
+
+    async def load(self, key: str) -> Optional[StoredResponse]:
+        """Read a live row for key, clearing it out of the way if it has expired"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            row = await db.get(IdempotencyKeyDB, key)
+            if row is not None and row.expires_at > now:
+                return StoredResponse(row.fingerprint, row.status_code, row.body)
+            self.lookups += 1
+            if row is not None or self.lookups % PRUNE_EVERY == 0:
+                await db.execute(delete(IdempotencyKeyDB).where(IdempotencyKeyDB.expires_at <= now))
+                await db.commit()
+        return None
+
+    def record(self, db: AsyncSession, key: str, stored: StoredResponse, ttl: int):
+        now = datetime.utcnow()
+        db.add(IdempotencyKeyDB(
+            key=key, fingerprint=stored.fingerprint, status_code=stored.status_code, body=stored.body,
+            created_at=now, expires_at=now + timedelta(seconds=ttl),
+        ))
+
+    async def lookup(self, key: str) -> Optional[StoredResponse]:
+        return self.cached(key) or await self.load(key)
+
+store: MemoryStore = DatabaseStore() if IDEMPOTENCY_STORE == "database" else MemoryStore()
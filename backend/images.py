@@ -0,0 +1,238 @@
+"""Responsive image variants for menu images, site assets and PWA icons.
+
+Every source image is resized to a few widths and encoded as AVIF (when
+Pillow supports it) and WebP. Filenames carry a hash of the source bytes
+and the encoder settings, so variants can be cached forever and rebuilding
+an unchanged image is a no-op. variants.json in the output directory maps
+each source URL to its variants; menu items also keep theirs in the
+database so the API can return srcset data next to image_url.
+
+    python images.py             # menu images, assets/images and the PWA icons
+    python images.py --source ../frontend/public --output ../frontend/public/assets/variants
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional, without it items simply have no variants
+    Image = None
+
+from database import AsyncSessionLocal, async_engine, BASE_DIR
+from models import MenuItemDB
+from files import read_json, write_atomic
+
+IMAGE_SOURCE_DIR = os.path.abspath(os.getenv("IMAGE_SOURCE_DIR", os.path.join(BASE_DIR, "..", "frontend", "public")))
+IMAGE_OUTPUT_DIR = os.path.abspath(os.getenv("IMAGE_OUTPUT_DIR", os.path.join(IMAGE_SOURCE_DIR, "assets", "variants")))
+# Where the static site serves the output of a build run
+STATIC_VARIANTS_URL = "/assets/variants"
+# Where the output directory is served while the API runs. Unset, files written at
+# runtime are never served (the site was built beforehand), so menu edits attach no
+# new variants; in development Vite serves frontend/public live at STATIC_VARIANTS_URL
+IMAGE_VARIANTS_URL = os.getenv("IMAGE_VARIANTS_URL", "").rstrip("/") or None
+
+PHOTO_WIDTHS = (320, 640, 960, 1280)
+ICON_WIDTHS = (48, 96, 192, 512)
+ASSET_PATTERNS = ("assets/images/*.jpg", "assets/images/*.jpeg", "assets/images/*.png")
+ICON_PATTERNS = ("android-chrome-*.png", "apple-touch-icon.png", "favicon*.png")
+# Preferred format first, matching the order of <source> elements in a <picture>
+ENCODERS = {
+    "avif": {"quality": 55, "speed": 8},
+    "webp": {"quality": 78, "method": 6},
+}
+ORIENTATION_TAG = 0x0112
+MANIFEST = "variants.json"
+VARIANT_PATTERN = re.compile(r"-[0-9a-f]{12}-\d+w\.(avif|webp)$")
+
+_lock = threading.Lock()
+
+def available_formats() -> List[str]:
+    if Image is None:
+        return []
+    return [fmt for fmt in ENCODERS if features.check(fmt)]
+
+def settings_digest(widths: Iterable[int]) -> bytes:
+    """Part of every variant name, so changing sizes or quality produces new files"""
+    return json.dumps([list(widths), ENCODERS], sort_keys=True).encode()
+
+def source_path(image_url: Optional[str], source_dir: str = IMAGE_SOURCE_DIR) -> Optional[str]:
+    """Local file behind a site-relative image URL; remote URLs are left alone"""
+    if not image_url or not image_url.startswith("/") or image_url.startswith("//"):
+        return None
+    path = os.path.realpath(os.path.join(source_dir, image_url.split("?")[0].lstrip("/")))
+    if not path.startswith(os.path.realpath(source_dir) + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+def target_widths(original: int, widths: Tuple[int, ...]) -> List[int]:
+    """Requested widths below the original, plus the original capped at the largest"""
+    chosen = [width for width in widths if width < original]
+    largest = min(original, widths[-1])
+    if largest not in chosen:
+        chosen.append(largest)
+    return chosen
+
+def build_variants(
+    path: str,
+    widths: Tuple[int, ...] = PHOTO_WIDTHS,
+    output_dir: str = IMAGE_OUTPUT_DIR,
+    url_prefix: str = STATIC_VARIANTS_URL,
+) -> Optional[dict]:
+    """Resize and encode one image, returning its variant set in the ImageSet shape"""
+    formats = available_formats()
+    if not formats:
+        return None
+    with open(path, "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source + settings_digest(widths)).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    with Image.open(path) as opened:
+        original_width, original_height = opened.size
+        # EXIF orientations 5-8 are rotated a quarter turn
+        if opened.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+            original_width, original_height = original_height, original_width
+        plan = []
+        for width in target_widths(original_width, widths):
+            height = max(1, round(original_height * width / original_width))
+            plan.append((width, height, {fmt: f"{stem}-{digest}-{width}w.{fmt}" for fmt in formats}))
+
+        # Only decode and resize when some variant is missing, rebuilding is otherwise just a stat per file
+        image = None
+        for width, height, filenames in plan:
+            missing = [fmt for fmt, filename in filenames.items() if not os.path.exists(os.path.join(output_dir, filename))]
+            if not missing:
+                continue
+            if image is None:
+                image = ImageOps.exif_transpose(opened)
+                has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+            for fmt in missing:
+                buffer = io.BytesIO()
+                resized.save(buffer, fmt.upper(), **ENCODERS[fmt])
+                write_atomic(os.path.join(output_dir, filenames[fmt]), buffer.getvalue())
+
+    variants = []
+    srcset: Dict[str, List[str]] = {fmt: [] for fmt in formats}
+    for width, height, filenames in plan:
+        for fmt, filename in filenames.items():
+            url = f"{url_prefix}/{filename}"
+            variants.append({"format": fmt, "width": width, "height": height, "url": url})
+            srcset[fmt].append(f"{url} {width}w")
+    return {
+        "width": original_width,
+        "height": original_height,
+        "srcset": {fmt: ", ".join(entries) for fmt, entries in srcset.items()},
+        "variants": variants,
+    }
+
+def update_manifest(output_dir: str, entries: Dict[str, dict], replace: bool = False):
+    """Record variant sets by source URL; replace also deletes variants nothing refers to"""
+    with _lock:
+        manifest = {} if replace else read_json(os.path.join(output_dir, MANIFEST), {})
+        manifest.update(entries)
+        os.makedirs(output_dir, exist_ok=True)
+        write_atomic(os.path.join(output_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+        if replace:
+            keep = {variant["url"].rsplit("/", 1)[-1] for entry in manifest.values() for variant in entry["variants"]}
+            for filename in os.listdir(output_dir):
+                if VARIANT_PATTERN.search(filename) and filename not in keep:
+                    os.remove(os.path.join(output_dir, filename))
+
+def variants_for_url(image_url: Optional[str]) -> Optional[dict]:
+    """Variant set for a menu image URL, or None when there is no local source, no Pillow
+    or nowhere the new files would be served from"""
+    if IMAGE_VARIANTS_URL is None:
+        return None
+    path = source_path(image_url)
+    if path is None or not available_formats():
+        return None
+    try:
+        image_set = build_variants(path, url_prefix=IMAGE_VARIANTS_URL)
+    except (OSError, ValueError) as e:
+        # An unreadable image must not fail the menu edit, it is served without variants
+        print(f"Could not build variants for {image_url}: {e}")
+        return None
+    if image_set is not None:
+        update_manifest(IMAGE_OUTPUT_DIR, {image_url: image_set})
+    return image_set
+
+async def variants_for(image_url: Optional[str]) -> Optional[dict]:
+    """variants_for_url off the event loop, encoding takes a while"""
+    return await asyncio.to_thread(variants_for_url, image_url)
+
+def static_sources(source_dir: str) -> List[Tuple[str, Tuple[int, ...]]]:
+    """Site images and PWA icons under source_dir, each with the widths to build"""
+    found = []
+    for patterns, widths in ((ASSET_PATTERNS, PHOTO_WIDTHS), (ICON_PATTERNS, ICON_WIDTHS)):
+        for pattern in patterns:
+            for path in sorted(glob.glob(os.path.join(source_dir, pattern))):
+                found.append(("/" + os.path.relpath(path, source_dir).replace(os.sep, "/"), widths))
+    return found
+
+async def build_all(source_dir: str, output_dir: str, url_prefix: str) -> Tuple[int, int]:
+    """Rebuild variants for every menu image and static asset, returning (images, items updated)"""
+    sources = dict(static_sources(source_dir))
+    async with AsyncSessionLocal() as db:
+        items = (await db.scalars(select(MenuItemDB).where(MenuItemDB.image_url.is_not(None)))).all()
+        for item in items:
+            sources.setdefault(item.image_url, PHOTO_WIDTHS)
+
+        # Encoding is CPU bound, so spread the images over all cores
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor() as pool:
+            jobs = {
+                url: loop.run_in_executor(pool, build_variants, path, widths, output_dir, url_prefix)
+                for url, widths in sources.items()
+                for path in [source_path(url, source_dir)] if path
+            }
+            results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+
+        entries: Dict[str, dict] = {}
+        for url, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                # One unreadable image must not stop the rest, it is served without variants
+                print(f"Could not build variants for {url}: {result}")
+                result = None
+            entries[url] = result
+
+        updated = 0
+        for item in items:
+            image_set = entries.get(item.image_url)
+            if item.images != image_set:
+                item.images = image_set
+                updated += 1
+        # One commit, so clients syncing menu changes see a single new version
+        await db.commit()
+    await async_engine.dispose()
+
+    update_manifest(output_dir, {url: entry for url, entry in entries.items() if entry}, replace=True)
+    return sum(1 for entry in entries.values() if entry), updated
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate responsive image variants")
+    parser.add_argument("--source", default=IMAGE_SOURCE_DIR, help="Static site root that image URLs resolve against")
+    parser.add_argument("--output", default=None, help="Variant directory (default <source>/assets/variants)")
+    parser.add_argument("--url-prefix", default=IMAGE_VARIANTS_URL or STATIC_VARIANTS_URL, help="URL the output directory is served at")
+    args = parser.parse_args()
+    if not available_formats():
+        parser.error("Pillow with WebP or AVIF support is required (pip install pillow)")
+    source_dir = os.path.abspath(args.source)
+    output_dir = os.path.abspath(args.output or os.path.join(source_dir, "assets", "variants"))
+    count, updated = asyncio.run(build_all(source_dir, output_dir, args.url_prefix.rstrip("/")))
+    print(f"Built variants for {count} image(s) in {output_dir}, updated {updated} menu item(s)")
+
+if __name__ == "__main__":
+    main()
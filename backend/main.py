@@ -1,19 +1,36 @@
+import time
+BOOT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import asyncio
 import json
 import os
+from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text, inspect
-from database import engine, Base, SessionLocal, DATA_DIR
-from models import CategoryDB, MenuItemDB, BannerDB
+from database import engine, async_engine, SessionLocal, DATA_DIR, database_health
+from models import CategoryDB, BannerDB, AppMetadataDB
+from schemas import MenuDocument
+from menu_io import apply_menu_document, apply_menu_changes
 from routers import menu, reservations, banners
 from auth import verify_password, create_access_token, AdminLoginRequest, AdminLoginResponse
+from migrate import run_migrations
+from bootstrap import ensure_schema, menu_fingerprint, get_metadata, set_metadata, MENU_KEY, MENU_DOCUMENT_KEY, OCCUPANCY_KEY
+import capacity
+import menu_search
+import reservation_queue
+import menu_cache
+from metrics import MetricsMiddleware, instrument_engine, registry
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware
+from responses import app_options
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Dosa Spot API")
+app = FastAPI(title="Dosa Spot API", **app_options())
 
+# Innermost, so rejections still carry CORS headers and preflights are never limited
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -26,7 +43,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed"],
 )
+# brotli or gzip per Accept-Encoding, for bodies over COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+# Added last so it wraps everything else and times the full request
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
 
 # Include Routers
 app.include_router(menu.router)
@@ -41,6 +65,14 @@ def read_root():
 def health_check():
     return {"status": "ok"}
 
+@app.get("/health/db")
+async def database_health_check():
+    return {"status": "ok", "database": await database_health()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/auth/login", response_model=AdminLoginResponse)
 async def admin_login(request: AdminLoginRequest):
     if verify_password(request.password):
@@ -80,40 +112,45 @@ def seed_banners(db: Session):
             db.add(BannerDB(message=msg, active=True))
         db.commit()
 
-def seed_db():
+def seed_db(update_menu: bool = False) -> bool:
+    """Seed empty tables from data/, returns False if the menu file could not be applied.
+
+    With update_menu, a menu that already exists gets only what changed in
+    menu.json since it was last applied; see apply_menu_changes. Items edited,
+    added or deleted by an admin are left as they are.
+    """
+    ok = True
     db = SessionLocal()
     menu_file = os.path.join(DATA_DIR, "menu.json")
     
     # Check if categories already exist
-    if db.query(CategoryDB).first():
-        seed_banners(db)
-        db.close()
-        return
+    populated = db.query(CategoryDB).first() is not None
 
     if os.path.exists(menu_file):
         try:
             with open(menu_file, "r") as f:
-                data = json.load(f)
-            for cat_data in data.get("categories", []):
-                db_cat = CategoryDB(name=cat_data["name"])
-                db.add(db_cat)
-                db.commit()
-                db.refresh(db_cat)
-                for item in cat_data.get("items", []):
-                    db_item = MenuItemDB(
-                        name=item["name"],
-                        price=item["price"],
-                        description=item["description"],
-                        spicy=item.get("spicy", False),
-                        image_url=item.get("image_url"),
-                        category_id=db_cat.id
-                    )
-                    db.add(db_item)
+                raw = f.read()
+            document = MenuDocument.model_validate_json(raw)
+            if not populated:
+                apply_menu_document(db, document, replace=False)
+                print(f"Successfully seeded database from {menu_file}")
+            elif update_menu:
+                previous = get_metadata(MENU_DOCUMENT_KEY)
+                if previous is None:
+                    print(f"No record of the {menu_file} last applied, leaving the existing menu as it is")
+                else:
+                    result = apply_menu_changes(db, MenuDocument.model_validate_json(previous), document)
+                    print(f"Applied changes in {menu_file}: {result.categories_created} categories and "
+                          f"{result.items_created} items added, {result.items_updated} items updated, "
+                          f"{result.items_deleted} items removed")
+            # Committed with the menu so the next change is diffed against what was really applied
+            db.merge(AppMetadataDB(key=MENU_DOCUMENT_KEY, value=raw))
             db.commit()
-            print(f"Successfully seeded database from {menu_file}")
         except Exception as e:
+            db.rollback()
+            ok = False
             print(f"Error seeding database from file: {e}")
-    else:
+    elif not populated:
         # Hardcoded fallback seeding
         categories_data = {
             "Signature Dosas": [
@@ -126,22 +163,97 @@ def seed_db():
                 {"name": "Medhu Vada (2pcs)", "price": 7.99, "description": "Savory fried lentil donuts.", "spicy": False, "image_url": "/assets/images/vada.jpg"}
             ]
         }
-        for cat_name, items in categories_data.items():
-            db_cat = CategoryDB(name=cat_name)
-            db.add(db_cat)
-            db.commit()
-            db.refresh(db_cat)
-            for item_data in items:
-                db_item = MenuItemDB(**item_data, category_id=db_cat.id)
-                db.add(db_item)
+        document = MenuDocument(categories=[
+            {"name": cat_name, "items": items} for cat_name, items in categories_data.items()
+        ])
+        apply_menu_document(db, document, replace=False)
         db.commit()
 
     seed_banners(db)
     db.close()
+    return ok
+
+def rebuild_occupancy_if_needed(force: bool = False) -> bool:
+    """Recount slot occupancy when it has never been built or the slot keying changed"""
+    fingerprint = capacity.config.fingerprint()
+    if not force and get_metadata(OCCUPANCY_KEY) == fingerprint:
+        return False
+    db = SessionLocal()
+    try:
+        capacity.rebuild_occupancy(db)
+        db.commit()
+    finally:
+        db.close()
+    set_metadata(OCCUPANCY_KEY, fingerprint)
+    return True
+
+def seed_and_record(fingerprint: str, update_menu: bool = False):
+    if seed_db(update_menu):
+        set_metadata(MENU_KEY, fingerprint)
+    # Anything served while seeding ran must not stick around
+    menu_cache.invalidate()
+
+def prepare(loop: Optional[asyncio.AbstractEventLoop] = None) -> str:
+    """One-time database work before serving, returning a summary for the startup log.
+
+    A pre-forking launcher runs this once in its master process; otherwise the
+    first startup event does. When menu.json changed since it was last applied,
+    the changes are applied to the existing menu (banners.json only ever fills
+    an empty table, so it is not tracked); with a running loop that happens in
+    the background instead of inline.
+    """
+    # DDL only runs when the models changed since the recorded schema version
+    schema_changed = ensure_schema()
+    # Data and type changes that create_all cannot make, each applied once
+    migrations = run_migrations()
+    # Before seeding, so the full-text triggers see the seeded rows
+    search_backend = menu_search.setup()
+    # Must be current before the first booking is accepted
+    # and recounted after migrations, which may have rewritten the dates it is keyed on
+    occupancy_rebuilt = rebuild_occupancy_if_needed(force=bool(migrations))
+    fingerprint = menu_fingerprint()
+    stored = get_metadata(MENU_KEY)
+    if stored == fingerprint:
+        seeding = "skipped"
+    elif stored is None:
+        # Never seeded: hold requests until the menu exists. A menu from before menu.json was
+        # recorded is left as it is, its edits cannot be told apart from the file's
+        seed_and_record(fingerprint)
+        seeding = "inline"
+    elif loop is None:
+        seed_and_record(fingerprint, update_menu=True)
+        seeding = "inline"
+    else:
+        # menu.json changed on an already populated database, keep it off the serving path
+        loop.run_in_executor(None, seed_and_record, fingerprint, True)
+        seeding = "background"
+    return (f"schema {'updated' if schema_changed else 'unchanged'}, "
+            f"migrations {len(migrations)} applied, "
+            f"occupancy {'rebuilt' if occupancy_rebuilt else 'current'}, search {search_backend}, seeding {seeding}")
+
+# Filled in by prepare(), either in this process or in the master it was forked from
+startup_summary: Optional[str] = None
 
 @app.on_event("startup")
 async def startup_event():
-    seed_db()  # Then seed data
+    global startup_summary
+    prepared_here = startup_summary is None
+    if prepared_here:
+        startup_summary = prepare(asyncio.get_running_loop())
+    if reservation_queue.writer is not None:
+        reservation_queue.writer.start()
+    if prepared_here:
+        elapsed_ms = (time.perf_counter() - BOOT_STARTED) * 1000
+        print(f"Startup finished in {elapsed_ms:.0f} ms ({startup_summary})")
+    else:
+        print(f"Worker {os.getpid()} started")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Queued reservations are committed before the connections go away
+    if reservation_queue.writer is not None:
+        await reservation_queue.writer.stop()
+    await async_engine.dispose()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,96 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from models import CategoryDB
+from schemas import MenuData
+import compression
+import menu_sync
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    body: bytes
+    etag: str
+    menu: MenuData
+    # menu_version counter the snapshot was built at, every worker checks it before serving
+    generation: int
+    category_ids: FrozenSet[int]
+    # Compressed bodies by encoding, filled on first request for each
+    encoded: Dict[str, bytes] = field(default_factory=dict, compare=False)
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Each content-coding is its own representation, so it gets its own strong ETag"""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def body_for(self, encoding: Optional[str]) -> bytes:
+        """The body in the given Content-Encoding, compressed once at maximum quality"""
+        if encoding is None:
+            return self.body
+        if encoding not in self.encoded:
+            self.encoded[encoding] = compression.compress(self.body, encoding, best=True)
+        return self.encoded[encoding]
+
+_snapshot: Optional[MenuSnapshot] = None
+_version = 0
+
+async def build_snapshot(db: AsyncSession, generation: Optional[int] = None) -> MenuSnapshot:
+    """Serialize the whole menu once and store it as the current snapshot"""
+    global _snapshot, _version
+    # Read before the rows: a change committed in between only means one extra rebuild
+    if generation is None:
+        generation = await menu_sync.current_version(db)
+    # Load every category with its items in two queries instead of N+1
+    # populate_existing so collections already loaded in this session are not served stale
+    result = await db.execute(
+        select(CategoryDB)
+        .options(selectinload(CategoryDB.items))
+        .order_by(CategoryDB.id)
+        .execution_options(populate_existing=True)
+    )
+    categories = result.scalars().all()
+    menu = MenuData.model_validate({"categories": categories})
+    body = menu.model_dump_json().encode()
+    # Strong ETag derived from the content so every worker agrees on it
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    _version += 1
+    _snapshot = MenuSnapshot(
+        version=_version, body=body, etag=etag, menu=menu,
+        generation=generation, category_ids=frozenset(cat.id for cat in categories),
+    )
+    return _snapshot
+
+async def get_snapshot(db: AsyncSession) -> MenuSnapshot:
+    """Return the cached snapshot, rebuilding it when the menu changed in any worker"""
+    generation = await menu_sync.current_version(db)
+    if _snapshot is None or _snapshot.generation != generation:
+        return await build_snapshot(db, generation)
+    return _snapshot
+
+async def category_exists(db: AsyncSession, cat_id: int) -> bool:
+    return cat_id in (await get_snapshot(db)).category_ids
+
+def invalidate():
+    """Drop the snapshot so the next read rebuilds it"""
+    global _snapshot
+    _snapshot = None
+
+ENCODING_SUFFIXES = ('-br"', '-gzip"')
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against a snapshot's ETag, in any content-coding"""
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, so ignore any W/ prefix; a cached copy in
+    # another coding is the same version of the menu, so its tag matches too
+    candidates = []
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        candidates.append(tag)
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,160 @@
+import json
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from database import AsyncSessionLocal
+from models import CategoryDB, MenuItemDB
+from schemas import MenuDocument, MenuImportResult, MenuItem
+
+ITEM_FIELDS = ("name", "price", "description", "spicy", "image_url")
+
+def apply_menu_document(db: Session, document: MenuDocument, replace: bool = True) -> MenuImportResult:
+    """Diff a whole menu document against the database inside the caller's transaction.
+
+    Categories are matched by name and items by name within their category.
+    With replace, anything missing from the document is deleted. The caller commits.
+    """
+    result = MenuImportResult()
+    existing_categories = {
+        cat.name: cat
+        for cat in db.query(CategoryDB).options(selectinload(CategoryDB.items)).all()
+    }
+
+    for cat_doc in document.categories:
+        db_cat = existing_categories.pop(cat_doc.name, None)
+        if db_cat is None:
+            db_cat = CategoryDB(name=cat_doc.name, items=[])
+            db.add(db_cat)
+            result.categories_created += 1
+
+        existing_items = {}
+        for db_item in db_cat.items:
+            existing_items.setdefault(db_item.name, []).append(db_item)
+
+        for item_doc in cat_doc.items:
+            values = item_doc.model_dump(include=set(ITEM_FIELDS))
+            matches = existing_items.get(item_doc.name)
+            if not matches:
+                db_cat.items.append(MenuItemDB(**values))
+                result.items_created += 1
+                continue
+            db_item = matches.pop(0)
+            changed = False
+            for field, value in values.items():
+                if getattr(db_item, field) != value:
+                    setattr(db_item, field, value)
+                    changed = True
+            if changed:
+                result.items_updated += 1
+            else:
+                result.items_unchanged += 1
+
+        if replace:
+            for leftovers in existing_items.values():
+                for db_item in leftovers:
+                    db.delete(db_item)
+                    result.items_deleted += 1
+
+    if replace:
+        for db_cat in existing_categories.values():
+            for db_item in db_cat.items:
+                db.delete(db_item)
+                result.items_deleted += 1
+            db.delete(db_cat)
+            result.categories_deleted += 1
+
+    # All inserts and updates go out in batched statements here
+    db.flush()
+    return result
+
+def document_items(document: MenuDocument) -> Dict[Tuple[str, str], dict]:
+    """Item values by (category, item name), the first of any repeated names winning"""
+    items = {}
+    for cat_doc in document.categories:
+        for item_doc in cat_doc.items:
+            items.setdefault((cat_doc.name, item_doc.name), item_doc.model_dump(include=set(ITEM_FIELDS)))
+    return items
+
+def apply_menu_changes(db: Session, previous: MenuDocument, document: MenuDocument) -> MenuImportResult:
+    """Apply only what changed between two versions of a menu file, inside the caller's transaction.
+
+    An item is updated or deleted only while its row still holds what previous
+    put there, so admin edits win over the file. Items new to the file are added
+    unless an admin already created one by that name, and items from previous
+    that an admin deleted stay deleted. The caller commits.
+    """
+    result = MenuImportResult()
+    old_items = document_items(previous)
+    new_items = document_items(document)
+    categories = {
+        cat.name: cat
+        for cat in db.query(CategoryDB).options(selectinload(CategoryDB.items)).all()
+    }
+
+    def find_row(cat_name: str, item_name: str) -> Optional[MenuItemDB]:
+        db_cat = categories.get(cat_name)
+        if db_cat is None:
+            return None
+        return next((db_item for db_item in db_cat.items if db_item.name == item_name), None)
+
+    def untouched(db_item: MenuItemDB, values: dict) -> bool:
+        return all(getattr(db_item, field) == value for field, value in values.items())
+
+    for (cat_name, item_name), values in new_items.items():
+        old_values = old_items.get((cat_name, item_name))
+        if old_values == values:
+            result.items_unchanged += 1
+            continue
+        db_item = find_row(cat_name, item_name)
+        if db_item is None:
+            if old_values is not None:
+                # Deleted by an admin since the file last had it
+                continue
+            db_cat = categories.get(cat_name)
+            if db_cat is None:
+                db_cat = categories[cat_name] = CategoryDB(name=cat_name, items=[])
+                db.add(db_cat)
+                result.categories_created += 1
+            db_cat.items.append(MenuItemDB(**values))
+            result.items_created += 1
+        elif old_values is not None and untouched(db_item, old_values):
+            for field, value in values.items():
+                setattr(db_item, field, value)
+            result.items_updated += 1
+
+    for (cat_name, item_name), old_values in old_items.items():
+        if (cat_name, item_name) in new_items:
+            continue
+        db_item = find_row(cat_name, item_name)
+        if db_item is not None and untouched(db_item, old_values):
+            db.delete(db_item)
+            result.items_deleted += 1
+
+    db.flush()
+    return result
+
+async def stream_menu_document():
+    """Yield the current menu as a JSON document, one category at a time"""
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(
+            select(CategoryDB.id, CategoryDB.name, MenuItemDB)
+            .outerjoin(MenuItemDB, MenuItemDB.category_id == CategoryDB.id)
+            .order_by(CategoryDB.id, MenuItemDB.id)
+            .execution_options(yield_per=200)
+        )
+        yield '{"categories": ['
+        current_id = None
+        first_item = True
+        async for cat_id, cat_name, db_item in rows:
+            if cat_id != current_id:
+                prefix = "" if current_id is None else "]}, "
+                yield f'{prefix}{{"name": {json.dumps(cat_name)}, "items": ['
+                current_id = cat_id
+                first_item = True
+            if db_item is not None:
+                item_json = MenuItem.model_validate(db_item).model_dump_json(include=set(ITEM_FIELDS))
+                yield item_json if first_item else ", " + item_json
+                first_item = False
+        if current_id is not None:
+            yield "]}"
+        yield "]}"
@@ -0,0 +1,294 @@
+"""Ranked, typo-tolerant menu search.
+
+The index lives in the database when it can: an FTS5 table kept in sync by
+triggers on SQLite, or a GIN expression index over a weighted tsvector on
+PostgreSQL. Otherwise an in-memory inverted index is used. Either way query
+terms are first matched against the menu vocabulary so misspellings still
+find something.
+"""
+import difflib
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import event, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import engine
+from models import MenuItemDB
+
+# Other workers' edits reach the vocabulary and memory index within this many seconds
+REFRESH_SECONDS = 60
+MAX_EXPANSIONS = 3
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall((value or "").lower())
+
+@dataclass
+class SearchFilters:
+    spicy: Optional[bool] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    category_id: Optional[int] = None
+
+    def matches(self, doc: "ItemDoc") -> bool:
+        return (
+            (self.spicy is None or bool(doc.spicy) == self.spicy)
+            and (self.min_price is None or (doc.price or 0) >= self.min_price)
+            and (self.max_price is None or (doc.price or 0) <= self.max_price)
+            and (self.category_id is None or doc.category_id == self.category_id)
+        )
+
+    def sql(self, alias: str) -> Tuple[str, dict]:
+        clauses, params = [], {}
+        if self.spicy is not None:
+            clauses.append(f"{alias}.spicy = :spicy")
+            params["spicy"] = self.spicy
+        if self.min_price is not None:
+            clauses.append(f"{alias}.price >= :min_price")
+            params["min_price"] = self.min_price
+        if self.max_price is not None:
+            clauses.append(f"{alias}.price <= :max_price")
+            params["max_price"] = self.max_price
+        if self.category_id is not None:
+            clauses.append(f"{alias}.category_id = :category_id")
+            params["category_id"] = self.category_id
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+@dataclass
+class ItemDoc:
+    id: int
+    spicy: Optional[bool]
+    price: Optional[float]
+    category_id: Optional[int]
+    name_terms: Set[str]
+    description_terms: Set[str]
+
+    @classmethod
+    def from_row(cls, item) -> "ItemDoc":
+        return cls(
+            id=item.id, spicy=item.spicy, price=item.price, category_id=item.category_id,
+            name_terms=set(tokenize(item.name)), description_terms=set(tokenize(item.description)),
+        )
+
+class MemoryIndex:
+    """Inverted index over item names and descriptions, doubling as the vocabulary"""
+
+    def __init__(self):
+        self.docs: Dict[int, ItemDoc] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.term_counts: Counter = Counter()
+        self.loaded_at = 0.0
+
+    def load(self, items):
+        self.docs.clear()
+        self.postings.clear()
+        self.term_counts.clear()
+        for item in items:
+            self.upsert(ItemDoc.from_row(item))
+        self.loaded_at = time.monotonic()
+
+    def upsert(self, doc: ItemDoc):
+        self.remove(doc.id)
+        self.docs[doc.id] = doc
+        for term in doc.name_terms | doc.description_terms:
+            self.postings[term].add(doc.id)
+            self.term_counts[term] += 1
+
+    def remove(self, item_id: int):
+        doc = self.docs.pop(item_id, None)
+        if doc is None:
+            return
+        for term in doc.name_terms | doc.description_terms:
+            self.postings[term].discard(item_id)
+            self.term_counts[term] -= 1
+            if self.term_counts[term] <= 0:
+                del self.term_counts[term]
+                del self.postings[term]
+
+    def expand(self, term: str) -> List[str]:
+        """Known terms a query term may mean: itself, prefix completions and close spellings"""
+        if term in self.term_counts:
+            return [term]
+        prefixed = [known for known in self.term_counts if known.startswith(term)] if len(term) >= 3 else []
+        close = difflib.get_close_matches(term, list(self.term_counts), n=MAX_EXPANSIONS, cutoff=0.75)
+        expanded = sorted(set(prefixed), key=lambda known: -self.term_counts[known])[:MAX_EXPANSIONS]
+        return expanded + [known for known in close if known not in expanded]
+
+    def search(self, groups: List[List[str]], filters: SearchFilters, limit: int) -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = defaultdict(float)
+        matched_groups: Dict[int, int] = defaultdict(int)
+        for group in groups:
+            group_scores: Dict[int, float] = {}
+            for position, term in enumerate(group):
+                # Exact term first, expansions count a little less
+                weight = 1.0 if position == 0 else 0.8
+                for item_id in self.postings.get(term, ()):
+                    doc = self.docs[item_id]
+                    score = weight * (3.0 if term in doc.name_terms else 1.0)
+                    group_scores[item_id] = max(group_scores.get(item_id, 0.0), score)
+            for item_id, score in group_scores.items():
+                scores[item_id] += score
+                matched_groups[item_id] += 1
+        # Items matching more query terms win, then tighter (shorter) names
+        hits = [
+            (item_id, score + 10.0 * matched_groups[item_id] - 0.01 * len(self.docs[item_id].name_terms))
+            for item_id, score in scores.items()
+            if filters.matches(self.docs[item_id])
+        ]
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:limit]
+
+class MemoryBackend:
+    name = "memory"
+
+    def setup(self, conn):
+        pass
+
+    async def search(self, db, groups, filters, limit):
+        return index.search(groups, filters, limit)
+
+class SQLiteFTSBackend:
+    name = "sqlite-fts5"
+
+    def setup(self, conn):
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts "
+            "USING fts5(name, description, tokenize='porter unicode61')"
+        ))
+        # Triggers keep the index current on every write path, whichever worker makes it
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS menu_items_fts_insert AFTER INSERT ON menu_items BEGIN "
+            "INSERT INTO menu_items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS menu_items_fts_delete AFTER DELETE ON menu_items BEGIN "
+            "DELETE FROM menu_items_fts WHERE rowid = old.id; END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS menu_items_fts_update AFTER UPDATE OF name, description ON menu_items BEGIN "
+            "UPDATE menu_items_fts SET name = new.name, description = new.description WHERE rowid = old.id; END"
+        ))
+        indexed = conn.execute(text("SELECT count(*) FROM menu_items_fts")).scalar()
+        total = conn.execute(text("SELECT count(*) FROM menu_items")).scalar()
+        if indexed != total:
+            conn.execute(text("DELETE FROM menu_items_fts"))
+            conn.execute(text(
+                "INSERT INTO menu_items_fts(rowid, name, description) SELECT id, name, description FROM menu_items"
+            ))
+
+    def match_expression(self, groups: List[List[str]], operator: str) -> str:
+        clauses = []
+        for group in groups:
+            alternatives = [f'"{group[0]}"*'] + [f'"{term}"' for term in group[1:]]
+            clauses.append("(" + " OR ".join(alternatives) + ")")
+        return f" {operator} ".join(clauses)
+
+    async def search(self, db, groups, filters, limit):
+        filter_sql, params = filters.sql("m")
+        # Name matches weigh ten times description matches; bm25 is lower-is-better
+        sql = text(
+            "SELECT m.id, -bm25(menu_items_fts, 10.0, 1.0) AS score FROM menu_items_fts "
+            "JOIN menu_items m ON m.id = menu_items_fts.rowid "
+            f"WHERE menu_items_fts MATCH :query{filter_sql} ORDER BY score DESC, m.id LIMIT :limit"
+        )
+        for operator in ("AND", "OR"):
+            rows = (await db.execute(sql, {**params, "query": self.match_expression(groups, operator), "limit": limit})).all()
+            if rows or len(groups) == 1:
+                return [(row[0], float(row[1])) for row in rows]
+        return []
+
+class PostgresBackend:
+    name = "postgresql-tsvector"
+    DOCUMENT = (
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    )
+
+    def setup(self, conn):
+        # Expression index, so PostgreSQL maintains it on every insert, update and delete
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_menu_items_search ON menu_items USING GIN (({self.DOCUMENT}))"
+        ))
+
+    async def search(self, db, groups, filters, limit):
+        filter_sql, params = filters.sql("menu_items")
+        sql = text(
+            f"SELECT id, ts_rank({self.DOCUMENT}, to_tsquery('english', :query)) AS score FROM menu_items "
+            f"WHERE ({self.DOCUMENT}) @@ to_tsquery('english', :query){filter_sql} "
+            "ORDER BY score DESC, id LIMIT :limit"
+        )
+        for operator in (" & ", " | "):
+            query = operator.join(
+                "(" + " | ".join([f"{group[0]}:*"] + group[1:]) + ")" for group in groups
+            )
+            rows = (await db.execute(sql, {**params, "query": query, "limit": limit})).all()
+            if rows or len(groups) == 1:
+                return [(row[0], float(row[1])) for row in rows]
+        return []
+
+index = MemoryIndex()
+backend = MemoryBackend()
+
+def setup():
+    """Pick the best available backend and make sure its index exists and is populated"""
+    global backend
+    candidate = {"sqlite": SQLiteFTSBackend, "postgresql": PostgresBackend}.get(engine.dialect.name)
+    if candidate is None:
+        return backend.name
+    try:
+        with engine.begin() as conn:
+            candidate().setup(conn)
+        backend = candidate()
+    except OperationalError as e:
+        print(f"Full-text index unavailable, using in-memory menu search: {e}")
+    return backend.name
+
+async def ensure_index(db: AsyncSession):
+    if not index.loaded_at or time.monotonic() - index.loaded_at > REFRESH_SECONDS:
+        index.load((await db.scalars(select(MenuItemDB))).all())
+
+async def search(db: AsyncSession, query: str, filters: SearchFilters, limit: int) -> List[Tuple[MenuItemDB, float]]:
+    await ensure_index(db)
+    groups = []
+    for term in dict.fromkeys(tokenize(query)):
+        expanded = index.expand(term)
+        # Keep the raw term first so prefix matching still applies to it
+        groups.append([term] + [known for known in expanded if known != term])
+    if not groups:
+        return []
+    hits = await backend.search(db, groups, filters, limit)
+    if not hits:
+        return []
+    items = {item.id: item for item in (await db.scalars(select(MenuItemDB).where(MenuItemDB.id.in_([hit[0] for hit in hits]))))}
+    return [(items[item_id], score) for item_id, score in hits if item_id in items]
+
+# --- Incremental maintenance of the in-memory index for this process's own writes ---
+
+@event.listens_for(Session, "after_flush")
+def collect_item_changes(session, flush_context):
+    changes = session.info.setdefault("search_changes", {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, MenuItemDB):
+            changes[obj.id] = ItemDoc.from_row(obj)
+    for obj in session.deleted:
+        if isinstance(obj, MenuItemDB):
+            changes[obj.id] = None
+
+@event.listens_for(Session, "after_commit")
+def apply_item_changes(session):
+    changes = session.info.pop("search_changes", None)
+    if not changes or not index.loaded_at:
+        return
+    for item_id, doc in changes.items():
+        if doc is None:
+            index.remove(item_id)
+        else:
+            index.upsert(doc)
+
+@event.listens_for(Session, "after_rollback")
+def discard_item_changes(session):
+    session.info.pop("search_changes", None)
@@ -0,0 +1,80 @@
+from datetime import datetime
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import CategoryDB, MenuItemDB, CounterDB, MenuTombstoneDB
+from schemas import MenuChanges, CategoryChange, MenuItemChange
+
+MENU_VERSION = "menu_version"
+
+def next_version(connection: Connection, name: str) -> int:
+    """Increment a named counter; the row lock serializes writers until they commit"""
+    value = connection.execute(
+        update(CounterDB).where(CounterDB.name == name).values(value=CounterDB.value + 1).returning(CounterDB.value)
+    ).scalar()
+    if value is None:
+        connection.execute(insert(CounterDB).values(name=name, value=1))
+        value = 1
+    return value
+
+@event.listens_for(Session, "before_flush")
+def track_menu_changes(session, flush_context, instances):
+    """Stamp changed menu rows with a new version and record tombstones for deletions"""
+    changed = [
+        obj for obj in session.new | session.dirty
+        if isinstance(obj, (CategoryDB, MenuItemDB)) and (obj in session.new or session.is_modified(obj))
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, (CategoryDB, MenuItemDB))]
+    if not changed and not deleted:
+        return
+
+    version = next_version(session.connection(), MENU_VERSION)
+    now = datetime.utcnow()
+    for obj in changed:
+        obj.version = version
+        obj.updated_at = now
+    for obj in deleted:
+        session.add(MenuTombstoneDB(
+            entity="category" if isinstance(obj, CategoryDB) else "item",
+            entity_id=obj.id,
+            version=version,
+            deleted_at=now,
+        ))
+
+async def counter_value(db: AsyncSession, name: str) -> int:
+    """Current value of a named counter, 0 before its first increment"""
+    value = await db.scalar(select(CounterDB.value).where(CounterDB.name == name))
+    return value or 0
+
+async def current_version(db: AsyncSession) -> int:
+    return await counter_value(db, MENU_VERSION)
+
+async def changes_since(db: AsyncSession, since: int) -> MenuChanges:
+    """Rows and tombstones newer than the client's version, everything when since is 0"""
+    version = await current_version(db)
+    # A client ahead of the server synced against another database, start it over
+    full = since <= 0 or since > version
+
+    categories = select(CategoryDB).order_by(CategoryDB.id)
+    items = select(MenuItemDB).order_by(MenuItemDB.id)
+    if not full:
+        categories = categories.where(CategoryDB.version > since)
+        items = items.where(MenuItemDB.version > since)
+
+    deleted_categories, deleted_items = [], []
+    if not full:
+        tombstones = await db.execute(
+            select(MenuTombstoneDB.entity, MenuTombstoneDB.entity_id).where(MenuTombstoneDB.version > since)
+        )
+        for entity, entity_id in tombstones:
+            (deleted_categories if entity == "category" else deleted_items).append(entity_id)
+
+    return MenuChanges(
+        version=version,
+        full=full,
+        categories=[CategoryChange.model_validate(cat) for cat in (await db.scalars(categories))],
+        items=[MenuItemChange.model_validate(item) for item in (await db.scalars(items))],
+        deleted_categories=deleted_categories,
+        deleted_items=deleted_items,
+    )
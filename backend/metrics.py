@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+
+# Log requests slower than this many milliseconds, 0 disables the slow-request log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+class RequestStats:
+    """Per-request DB counters, filled in by the engine hooks"""
+    __slots__ = ("queries", "query_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.query_time: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.queries_per_request: Dict[Tuple[str, str], Histogram] = {}
+        self.rejected: Dict[Tuple[str, str, str], int] = defaultdict(int)
+
+    def record(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        key = (method, route)
+        with self.lock:
+            self.requests[(method, route, status)] += 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.queries[key] += stats.queries
+            self.query_time[key] += stats.query_time
+            self.queries_per_request.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+
+    def reject(self, reason: str, method: str, route: str):
+        """Count a request turned away before reaching its route"""
+        with self.lock:
+            self.rejected[(reason, method, route)] += 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Completed requests by route and status",
+            "# TYPE http_requests_total counter",
+        ]
+        with self.lock:
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            lines += [
+                "# HELP http_requests_rejected_total Requests refused by rate limiting or load shedding",
+                "# TYPE http_requests_rejected_total counter",
+            ]
+            for (reason, method, route), count in sorted(self.rejected.items()):
+                lines.append(f'http_requests_rejected_total{{reason="{reason}",method="{method}",route="{route}"}} {count}')
+            lines += [
+                "# HELP http_request_duration_seconds Request latency by route",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for key, hist in sorted(self.latency.items()):
+                lines += render_histogram("http_request_duration_seconds", key, hist)
+            lines += [
+                "# HELP db_queries_total SQL statements executed by route",
+                "# TYPE db_queries_total counter",
+            ]
+            for (method, route), count in sorted(self.queries.items()):
+                lines.append(f'db_queries_total{{method="{method}",route="{route}"}} {count}')
+            lines += [
+                "# HELP db_query_duration_seconds_total Time spent in SQL statements by route",
+                "# TYPE db_query_duration_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.query_time.items()):
+                lines.append(f'db_query_duration_seconds_total{{method="{method}",route="{route}"}} {seconds:.6f}')
+            lines += [
+                "# HELP db_queries_per_request SQL statements issued per request by route",
+                "# TYPE db_queries_per_request histogram",
+            ]
+            for key, hist in sorted(self.queries_per_request.items()):
+                lines += render_histogram("db_queries_per_request", key, hist)
+        return "\n".join(lines) + "\n"
+
+def render_histogram(name: str, key: Tuple[str, str], hist: Histogram):
+    method, route = key
+    labels = f'method="{method}",route="{route}"'
+    lines = []
+    cumulative = 0
+    for bound, count in zip(hist.buckets, hist.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.total:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+registry = Registry()
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and DB usage per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            _current_request.reset(token)
+            duration = time.perf_counter() - started
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            registry.record(scope["method"], route_path, status_code, duration, stats)
+            if SLOW_REQUEST_MS and duration * 1000 >= SLOW_REQUEST_MS:
+                print(
+                    f"Slow request: {scope['method']} {scope['path']} -> {status_code} "
+                    f"in {duration * 1000:.0f} ms ({stats.queries} queries, {stats.query_time * 1000:.0f} ms in DB)"
+                )
+
+def instrument_engine(engine):
+    """Count statements and their time against the request that issued them"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Stored on the execution context so failed statements leave nothing behind
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += time.perf_counter() - context.query_started
@@ -0,0 +1,67 @@
+"""Versioned schema migrations.
+
+New tables, columns and indexes are still picked up by bootstrap.ensure_schema;
+anything that changes existing data or column types goes into a numbered module
+under migrations/ exposing upgrade(engine). Each one runs once per database and
+is recorded in schema_migrations. Migrations run at startup, or by hand:
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied and pending migrations
+"""
+import argparse
+import importlib
+import os
+import pkgutil
+import re
+from typing import List, Tuple
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from database import engine, BASE_DIR
+from models import SchemaMigrationDB
+
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+MIGRATION_PATTERN = re.compile(r"^(\d{4})_(\w+)$")
+
+def discover() -> List[Tuple[str, str]]:
+    """(version, module name) of every migration, oldest first"""
+    found = []
+    for module in pkgutil.iter_modules([MIGRATIONS_DIR]):
+        match = MIGRATION_PATTERN.match(module.name)
+        if match:
+            found.append((match.group(1), module.name))
+    return sorted(found)
+
+def applied_versions(bind: Engine = engine) -> set:
+    SchemaMigrationDB.__table__.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        return set(conn.execute(select(SchemaMigrationDB.version)).scalars())
+
+def run_migrations(bind: Engine = engine) -> List[str]:
+    """Apply pending migrations in order and return the names that ran"""
+    applied = applied_versions(bind)
+    ran = []
+    for version, name in discover():
+        if version in applied:
+            continue
+        print(f"Applying migration {name}")
+        module = importlib.import_module(f"migrations.{name}")
+        module.upgrade(bind)
+        with bind.begin() as conn:
+            conn.execute(SchemaMigrationDB.__table__.insert().values(version=version, name=name))
+        ran.append(name)
+    return ran
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned database migrations")
+    parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    args = parser.parse_args()
+    if args.status:
+        applied = applied_versions()
+        for version, name in discover():
+            print(f"{'applied' if version in applied else 'pending'}  {name}")
+        return
+    ran = run_migrations()
+    print(f"Applied {len(ran)} migration(s)" if ran else "Database is up to date")
+
+if __name__ == "__main__":
+    main()
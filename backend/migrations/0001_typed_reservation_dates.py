@@ -0,0 +1,89 @@
+"""Store reservation dates and times as DATE and TIME instead of free-form text.
+
+Rows are converted in batches, each in its own short transaction, so a large
+table is never locked for the whole backfill. Text that cannot be parsed
+becomes NULL and is kept in special_requests so nothing is lost.
+
+PostgreSQL gets new typed columns that are backfilled and then swapped in.
+SQLite has no column types to change, so values are rewritten in place into
+the canonical text its DATE and TIME types read.
+"""
+from typing import Optional
+from sqlalchemy import Date, bindparam, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from dates import parse_date, parse_time
+from models import BookingTime, ReservationDB
+
+BATCH_SIZE = 1000
+
+def convert(row) -> dict:
+    values = {"b_id": row.id, "b_date": None, "b_time": None, "b_special": row.special_requests}
+    lost = []
+    for key, raw, parse in (("b_date", row.date, parse_date), ("b_time", row.time, parse_time)):
+        if raw is None or not str(raw).strip():
+            continue
+        try:
+            values[key] = parse(raw)
+        except ValueError:
+            lost.append(f"{key[2:]} {raw!r}")
+    if lost:
+        note = "Original booking " + ", ".join(lost)
+        values["b_special"] = f"{row.special_requests}\n{note}" if row.special_requests else note
+    return values
+
+def convert_batch(conn: Connection, date_column: str, time_column: str, after_id: int) -> Optional[int]:
+    """Convert the next batch of rows after after_id, returning the last id or None when done"""
+    rows = conn.execute(
+        text("SELECT id, date, time, special_requests FROM reservations WHERE id > :after ORDER BY id LIMIT :limit"),
+        {"after": after_id, "limit": BATCH_SIZE},
+    ).all()
+    if not rows:
+        return None
+    statement = text(
+        f"UPDATE reservations SET {date_column} = :b_date, {time_column} = :b_time, "
+        "special_requests = :b_special WHERE id = :b_id"
+    ).bindparams(bindparam("b_date", type_=Date), bindparam("b_time", type_=BookingTime))
+    conn.execute(statement, [convert(row) for row in rows])
+    return rows[-1].id
+
+def backfill(bind: Engine, date_column: str, time_column: str) -> int:
+    last_id, converted = 0, 0
+    while True:
+        with bind.begin() as conn:
+            next_id = convert_batch(conn, date_column, time_column, last_id)
+        if next_id is None:
+            return last_id
+        last_id = next_id
+        converted += 1
+        if converted % 50 == 0:
+            print(f"  converted reservations up to id {last_id}")
+
+def upgrade_postgresql(bind: Engine):
+    columns = {column["name"]: column for column in inspect(bind).get_columns("reservations")}
+    if isinstance(columns["date"]["type"], Date):
+        return  # created by the current models
+    with bind.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE reservations ADD COLUMN IF NOT EXISTS date_typed DATE, "
+            "ADD COLUMN IF NOT EXISTS time_typed TIME"
+        ))
+    last_id = backfill(bind, "date_typed", "time_typed")
+    with bind.begin() as conn:
+        conn.execute(text("LOCK TABLE reservations IN ACCESS EXCLUSIVE MODE"))
+        # Catch up on bookings made while the backfill ran
+        while last_id is not None:
+            last_id = convert_batch(conn, "date_typed", "time_typed", last_id)
+        conn.execute(text("DROP INDEX IF EXISTS ix_reservations_date_status"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_reservations_date_time"))
+        conn.execute(text("ALTER TABLE reservations DROP COLUMN date, DROP COLUMN time"))
+        conn.execute(text("ALTER TABLE reservations RENAME COLUMN date_typed TO date"))
+        conn.execute(text("ALTER TABLE reservations RENAME COLUMN time_typed TO time"))
+
+def upgrade(bind: Engine):
+    if bind.dialect.name == "postgresql":
+        upgrade_postgresql(bind)
+    else:
+        backfill(bind, "date", "time")
+    # Composite indexes so date ranges, per-day listings and calendar grouping are index scans
+    for index in ReservationDB.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
@@ -1,12 +1,23 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Date, Time, Text, Index, JSON, LargeBinary
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from database import Base
+from dates import parse_date, parse_time
+
+# SQLite keeps times as text; HH:MM:SS, and still reads the HH:MM that older rows use
+BookingTime = Time().with_variant(
+    sqlite.TIME(storage_format="%(hour)02d:%(minute)02d:%(second)02d", regexp=r"(\d+):(\d+)(?::(\d+))?"),
+    "sqlite",
+)
 
 class CategoryDB(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    # Change tracking for delta sync, set on every flush that touches the row
+    version = Column(Integer, nullable=True, index=True)
+    updated_at = Column(DateTime, nullable=True)
     items = relationship("MenuItemDB", back_populates="category")
 
 class MenuItemDB(Base):
@@ -17,21 +28,33 @@ class MenuItemDB(Base):
     description = Column(Text)
     spicy = Column(Boolean, default=False)
     image_url = Column(String, nullable=True)
+    # Responsive variants of image_url built by images.py, in the ImageSet shape
+    images = Column(JSON(none_as_null=True), nullable=True)
     category_id = Column(Integer, ForeignKey("categories.id"))
+    version = Column(Integer, nullable=True, index=True)
+    updated_at = Column(DateTime, nullable=True)
     category = relationship("CategoryDB", back_populates="items")
 
-class ReservationDB(Base):
-    __tablename__ = "reservations"
+    @validates("image_url")
+    def validate_image_url(self, key, value):
+        # Variants belong to the old image, they are rebuilt for the new one
+        if value != self.image_url:
+            self.images = None
+        return value
+
+class ReservationFields:
+    """Columns shared by live and archived reservations"""
     id = Column(Integer, primary_key=True, index=True)
     # Existing fields
     name = Column(String)
     email = Column(String)
     phone = Column(String)
-    date = Column(String)
-    time = Column(String)
+    # NULL only for legacy rows whose free-form text could not be migrated
+    date = Column(Date, nullable=True)
+    time = Column(BookingTime, nullable=True)
     guests = Column(Integer)
     status = Column(String, default="pending")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     # New fields for booking types
     booking_type = Column(String, default="table")  # table, private_event, catering
     event_type = Column(String, nullable=True)  # birthday, wedding, corporate, etc.
@@ -40,9 +63,98 @@ class ReservationDB(Base):
     budget = Column(String, nullable=True)  # for catering/private events
     venue = Column(String, nullable=True)  # for catering (client location or restaurant)
 
+    @validates("date")
+    def validate_date(self, key, value):
+        return parse_date(value) if value is not None else None
+
+    @validates("time")
+    def validate_time(self, key, value):
+        return parse_time(value) if value is not None else None
+
+class ReservationDB(ReservationFields, Base):
+    __tablename__ = "reservations"
+    __table_args__ = (
+        Index("ix_reservations_date_status", "date", "status"),
+        Index("ix_reservations_date_time", "date", "time"),
+    )
+
+class ArchivedReservationDB(ReservationFields, Base):
+    """Past and closed reservations moved out of the hot table by archive.py"""
+    __tablename__ = "reservations_archive"
+    # SQLite may hand a deleted id out again, so archived rows get their own key
+    archive_id = Column(Integer, primary_key=True)
+    id = Column(Integer, nullable=False, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_reservations_archive_date_status", "date", "status"),
+    )
+
 class BannerDB(Base):
     __tablename__ = "banners"
     id = Column(Integer, primary_key=True, index=True)
     message = Column(Text, nullable=False)
     active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class AppMetadataDB(Base):
+    __tablename__ = "app_metadata"
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SlotOccupancyDB(Base):
+    """Running totals per date/slot/booking_type, maintained alongside reservations"""
+    __tablename__ = "slot_occupancy"
+    date = Column(String, primary_key=True)
+    slot = Column(String, primary_key=True)  # empty for booking types counted per day
+    booking_type = Column(String, primary_key=True)
+    guests = Column(Integer, nullable=False, default=0)
+    bookings = Column(Integer, nullable=False, default=0)
+
+class CounterDB(Base):
+    """Named monotonic counters, incremented with a row lock held until commit"""
+    __tablename__ = "counters"
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKeyDB(Base):
+    """Responses to reservation requests, written with the reservation and replayed for retries until expires_at"""
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class ReservationEventDB(Base):
+    """Reservation changes for the admin event stream, read by every worker's hub"""
+    __tablename__ = "reservation_events"
+    # Never reuse ids, even once the newest rows are pruned; hubs only read past the last one they saw
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event = Column(String, nullable=False)
+    data = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class RateLimitDB(Base):
+    """Rate-limit budgets shared by all workers, one row per (route, client)"""
+    __tablename__ = "rate_limits"
+    key = Column(String, primary_key=True)
+    # Epoch seconds at which the client's budget is back to full; rows in the past can be deleted
+    tat = Column(Float, nullable=False, index=True)
+
+class MenuTombstoneDB(Base):
+    __tablename__ = "menu_tombstones"
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # category or item
+    entity_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaMigrationDB(Base):
+    """Versioned migrations that have been applied to this database"""
+    __tablename__ = "schema_migrations"
+    version = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
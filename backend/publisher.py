@@ -0,0 +1,148 @@
+"""Publish the menu and active banners as static, pre-compressed JSON artifacts.
+
+Artifacts get content-hashed filenames so static hosting can cache them
+forever; manifest.json maps logical names to the current files and is the
+only file that must be revalidated.
+
+    python publisher.py --output ../frontend/public/data
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import select
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always written
+    brotli = None
+
+from database import AsyncSessionLocal, async_engine
+from models import BannerDB
+from files import read_json, write_atomic
+from schemas import Banner
+import menu_cache
+
+# Publishing on admin writes is enabled by setting this directory
+STATIC_EXPORT_DIR = os.getenv("STATIC_EXPORT_DIR")
+
+MANIFEST = "manifest.json"
+HEADERS_FILE = "_headers"
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Only files that look like our own artifacts are ever pruned
+ARTIFACT_PATTERN = re.compile(r"\.[0-9a-f]{16}\.json(\.gz|\.br)?$")
+
+_lock = threading.Lock()
+
+def write_artifact(output_dir: str, name: str, body: bytes) -> dict:
+    """Write one artifact and its compressed variants under a content-hashed name"""
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    path = f"{name}.{digest}.json"
+    entry = {"path": path, "hash": digest, "size": len(body)}
+    full_path = os.path.join(output_dir, path)
+    if not os.path.exists(full_path):
+        write_atomic(full_path, body)
+        # mtime=0 keeps the gzip bytes identical for identical content
+        write_atomic(full_path + ".gz", gzip.compress(body, 9, mtime=0))
+        if brotli is not None:
+            write_atomic(full_path + ".br", brotli.compress(body, quality=11))
+    entry["gzip"] = path + ".gz"
+    if brotli is not None:
+        entry["br"] = path + ".br"
+    return entry
+
+def update_manifest(output_dir: str, artifacts: Dict[str, bytes], prefix: Optional[str] = None):
+    """Write artifacts, swap them into the manifest and prune files no manifest refers to.
+
+    Entries starting with prefix that are not in artifacts are dropped, which is
+    how deleted categories disappear.
+    """
+    with _lock:
+        previous = read_json(os.path.join(output_dir, MANIFEST), {"version": 0, "files": {}})
+        files = dict(previous.get("files", {}))
+        if prefix:
+            files = {name: entry for name, entry in files.items() if not name.startswith(prefix)}
+        for name, body in artifacts.items():
+            files[name] = write_artifact(output_dir, name, body)
+        manifest = {
+            "version": previous.get("version", 0) + 1,
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "files": files,
+        }
+        write_atomic(os.path.join(output_dir, MANIFEST), json.dumps(manifest, indent=2).encode())
+        write_headers(output_dir)
+        # Keep what the previous manifest pointed at so clients holding it can still fetch
+        prune(output_dir, [manifest, previous])
+
+def referenced_paths(manifest: dict) -> set:
+    paths = set()
+    for entry in manifest.get("files", {}).values():
+        paths.update(entry.get(key) for key in ("path", "gzip", "br") if entry.get(key))
+    return paths
+
+def prune(output_dir: str, manifests: List[dict]):
+    keep = set()
+    for manifest in manifests:
+        keep |= referenced_paths(manifest)
+    for root, _, filenames in os.walk(output_dir):
+        for filename in filenames:
+            rel_path = os.path.relpath(os.path.join(root, filename), output_dir).replace(os.sep, "/")
+            if rel_path not in keep and ARTIFACT_PATTERN.search(filename):
+                os.remove(os.path.join(root, filename))
+
+def write_headers(output_dir: str):
+    """Cache rules for hosts that read a _headers file (Netlify, Cloudflare Pages)"""
+    rules = (
+        f"/{MANIFEST}\n  Cache-Control: no-cache\n\n"
+        f"/*.json\n  Cache-Control: {IMMUTABLE}\n  Content-Type: application/json\n"
+    )
+    path = os.path.join(output_dir, HEADERS_FILE)
+    if not os.path.exists(path):
+        write_atomic(path, rules.encode())
+
+def menu_artifacts(snapshot) -> Dict[str, bytes]:
+    artifacts = {"menu": snapshot.body}
+    for category in snapshot.menu.categories:
+        artifacts[f"categories/{category.id}"] = category.model_dump_json().encode()
+    return artifacts
+
+def banner_artifacts(banners) -> Dict[str, bytes]:
+    active = [Banner.model_validate(banner).model_dump() for banner in banners if banner.active]
+    return {"banners": json.dumps(active).encode()}
+
+async def publish_menu(snapshot, output_dir: Optional[str] = STATIC_EXPORT_DIR):
+    """Publish menu artifacts after a committed menu change, off the event loop"""
+    if not output_dir:
+        return
+    await asyncio.to_thread(update_manifest, output_dir, menu_artifacts(snapshot), "categories/")
+
+async def publish_banners(db, output_dir: Optional[str] = STATIC_EXPORT_DIR):
+    if not output_dir:
+        return
+    banners = (await db.scalars(select(BannerDB).order_by(BannerDB.id))).all()
+    await asyncio.to_thread(update_manifest, output_dir, banner_artifacts(banners))
+
+async def publish_all(output_dir: str):
+    async with AsyncSessionLocal() as db:
+        snapshot = await menu_cache.build_snapshot(db)
+        await publish_menu(snapshot, output_dir)
+        await publish_banners(db, output_dir)
+    await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate static menu and banner artifacts")
+    parser.add_argument("--output", default=STATIC_EXPORT_DIR, help="Output directory (default $STATIC_EXPORT_DIR)")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("--output or STATIC_EXPORT_DIR is required")
+    asyncio.run(publish_all(args.output))
+    print(f"Published static artifacts to {args.output}")
+
+if __name__ == "__main__":
+    main()
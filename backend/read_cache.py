@@ -0,0 +1,72 @@
+"""Read-through caches for small, hot tables, coherent across workers.
+
+Every write to a cached table bumps a named generation counter in the
+counters table, inside the same transaction as the write. menu_sync does this
+for categories and items (menu_version, which the menu snapshot checks);
+banners get banner_version here. A cache remembers the generation it was
+loaded at, so a read costs one primary-key lookup: if any worker committed a
+change since, the number differs and the cache reloads, otherwise the value
+is served from memory.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+from pydantic import TypeAdapter
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import BannerDB
+from schemas import Banner
+from menu_sync import counter_value, next_version
+
+BANNER_VERSION = "banner_version"
+
+T = TypeVar("T")
+
+@event.listens_for(Session, "before_flush")
+def track_banner_changes(session, flush_context, instances):
+    """Bump the banner generation in the transaction that changes banners"""
+    changed = any(
+        isinstance(obj, BannerDB) and (obj in session.new or obj in session.deleted or session.is_modified(obj))
+        for obj in session.new | session.dirty | session.deleted
+    )
+    if changed:
+        next_version(session.connection(), BANNER_VERSION)
+
+class GenerationCache(Generic[T]):
+    """A value loaded from the database, reloaded whenever its generation counter moves"""
+
+    def __init__(self, counter: str, load: Callable[[AsyncSession], Awaitable[T]]):
+        self.counter = counter
+        self.load = load
+        self.entry: Optional[Tuple[int, T]] = None
+
+    async def get(self, db: AsyncSession) -> T:
+        generation = await counter_value(db, self.counter)
+        entry = self.entry
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+        # Read after the counter: a change committed in between only means one extra reload
+        value = await self.load(db)
+        self.entry = (generation, value)
+        return value
+
+    def clear(self):
+        self.entry = None
+
+@dataclass(frozen=True)
+class BannerBodies:
+    """GET /banners responses, serialized once per change; keyed by the active filter"""
+    bodies: Dict[Optional[bool], bytes]
+
+_banner_list = TypeAdapter(List[Banner])
+
+async def load_banners(db: AsyncSession) -> BannerBodies:
+    rows = (await db.scalars(select(BannerDB).order_by(BannerDB.id))).all()
+    banners = [Banner.model_validate(row) for row in rows]
+    return BannerBodies(bodies={
+        None: _banner_list.dump_json(banners),
+        True: _banner_list.dump_json([banner for banner in banners if banner.active]),
+        False: _banner_list.dump_json([banner for banner in banners if not banner.active]),
+    })
+
+banners = GenerationCache(BANNER_VERSION, load_banners)
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import re
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Sequence
+from sqlalchemy import Select
+from database import AsyncSessionLocal
+from dates import format_date, format_time
+
+EXPORT_COLUMNS = [
+    "id", "created_at", "date", "time", "name", "email", "phone", "guests", "status",
+    "booking_type", "event_type", "duration", "budget", "venue", "special_requests",
+]
+FETCH_SIZE = 1000
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = frozenset("=+-@\t\r")
+# Signed numbers and phone numbers such as +1 (613) 555-0142 are data, not formulas
+SIGNED_NUMBER = re.compile(r"[+-][\d\s().-]*\d[\d\s().-]*")
+CONVERTERS = {
+    "created_at": datetime.isoformat,
+    "archived_at": datetime.isoformat,
+    "date": format_date,
+    "time": format_time,
+}
+
+def row_converter(columns: List[str]) -> Callable[[Sequence], list]:
+    """Per-column conversion to plain JSON/CSV values, chosen once instead of per cell"""
+    converters = [CONVERTERS.get(name) for name in columns]
+
+    def convert(row) -> list:
+        return [
+            convert_value(value) if convert_value is not None and value is not None else value
+            for convert_value, value in zip(converters, row)
+        ]
+    return convert
+
+def csv_safe(values: list) -> list:
+    return [
+        "'" + value
+        if value.__class__ is str and value[:1] in FORMULA_PREFIXES and not SIGNED_NUMBER.fullmatch(value)
+        else value
+        for value in values
+    ]
+
+async def stream_reservations(query: Select, columns: List[str], fmt: str = "csv", compress: bool = False) -> AsyncIterator[bytes]:
+    """Stream the rows of query as CSV or NDJSON from a server-side cursor.
+
+    Rows are fetched FETCH_SIZE at a time and encoded straight into a small
+    buffer, so memory stays flat however many rows match, and each partition
+    is sent as one chunk. With compress the output is gzipped on the fly and
+    flushed at every chunk, so the client can decode each one as it arrives.
+    """
+    gzipper = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+    convert = row_converter(columns)
+
+    def take(final: bool = False) -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        if gzipper is None:
+            return data
+        # Without a flush zlib holds on to small inputs and the chunk comes out empty
+        return gzipper.compress(data) + gzipper.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(query.execution_options(yield_per=FETCH_SIZE))
+        # Send the header as soon as the query runs, not after the first partition
+        chunk = take()
+        if chunk:
+            yield chunk
+        # Whole partitions at a time, one hop to the driver per FETCH_SIZE rows
+        async for partition in rows.partitions():
+            if writer is not None:
+                writer.writerows(csv_safe(convert(row)) for row in partition)
+            else:
+                buffer.writelines(json.dumps(dict(zip(columns, convert(row)))) + "\n" for row in partition)
+            chunk = take()
+            if chunk:
+                yield chunk
+    chunk = take(final=True)
+    if chunk:
+        yield chunk
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import ReservationDB
+import capacity
+
+# "batched" hands reservations to the group-commit writer, "direct" commits each request itself
+WRITE_MODE = os.getenv("RESERVATION_WRITE_MODE", "direct")
+BATCH_SIZE = int(os.getenv("RESERVATION_BATCH_SIZE", "100"))
+BATCH_DELAY_MS = float(os.getenv("RESERVATION_BATCH_DELAY_MS", "10"))
+QUEUE_SIZE = int(os.getenv("RESERVATION_QUEUE_SIZE", "1000"))
+
+class QueueFullError(Exception):
+    pass
+
+# Called after the row is flushed, to add related rows to the same transaction
+OnInsert = Callable[[AsyncSession, ReservationDB], None]
+Entry = Tuple[dict, Optional[OnInsert], asyncio.Future]
+
+class GroupCommitWriter:
+    """Collects reservation inserts and commits them in batches.
+
+    The first queued row waits at most BATCH_DELAY_MS for company, so a
+    burst of bookings shares one transaction and one fsync instead of
+    paying for one each.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, delay_ms: float = BATCH_DELAY_MS, queue_size: int = QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.delay = delay_ms / 1000
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def submit(self, res_data: dict, on_insert: Optional[OnInsert] = None) -> ReservationDB:
+        """Queue one validated reservation and wait until it is committed"""
+        if not self.running:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((res_data, on_insert, future))
+        except asyncio.QueueFull:
+            raise QueueFullError("Reservation queue is full")
+        return await future
+
+    async def run(self):
+        while True:
+            first = await self.queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.perf_counter() + self.delay
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self.queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self.queue.get(), remaining)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self.write(batch)
+            if stopping:
+                break
+
+    async def write(self, batch: List[Entry]):
+        try:
+            await self.write_batch(batch)
+        except Exception:
+            # One bad row must not fail its neighbours, retry each on its own
+            for entry in batch:
+                if not entry[2].done():
+                    try:
+                        await self.write_batch([entry])
+                    except Exception as e:
+                        entry[2].set_exception(e)
+
+    async def write_batch(self, batch: List[Entry]):
+        accepted = []
+        async with AsyncSessionLocal() as db:
+            for res_data, on_insert, future in batch:
+                if future.cancelled():
+                    continue
+                db_res = ReservationDB(**res_data)
+                if capacity.holds_capacity(db_res.status):
+                    try:
+                        # A refused claim changes nothing, so the rest of the batch is unaffected
+                        await capacity.claim(db, db_res.date, db_res.time, db_res.booking_type, db_res.guests)
+                    except capacity.CapacityError as e:
+                        future.set_exception(e)
+                        continue
+                db.add(db_res)
+                accepted.append((db_res, on_insert, future))
+            if any(on_insert for _, on_insert, _ in accepted):
+                await db.flush()
+                for db_res, on_insert, _ in accepted:
+                    if on_insert is not None:
+                        on_insert(db, db_res)
+            await db.commit()
+        for db_res, _, future in accepted:
+            if not future.done():
+                future.set_result(db_res)
+
+    async def stop(self):
+        """Flush everything already queued, then stop the writer"""
+        if not self.running:
+            return
+        await self.queue.put(None)
+        await self.task
+        # Anything that raced in after the stop marker still gets written
+        leftovers = []
+        while not self.queue.empty():
+            entry = self.queue.get_nowait()
+            if entry is not None:
+                leftovers.append(entry)
+        if leftovers:
+            await self.write(leftovers)
+
+writer = GroupCommitWriter() if WRITE_MODE == "batched" else None
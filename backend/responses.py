@@ -0,0 +1,46 @@
+"""Fast JSON encoding for API responses.
+
+FastAPI 0.130+ serializes response models straight to JSON bytes in
+pydantic-core, which is as fast as it gets, but only while the app keeps the
+default response class. Older FastAPI (the newest that runs on Python 3.9)
+runs every response through jsonable_encoder and json.dumps instead, so there
+the app uses FastJSONResponse, and the large list endpoints serialize their
+models directly with json_response.
+"""
+import inspect
+import json
+from typing import Any, Dict, Optional
+from fastapi import routing
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is the fallback
+    orjson = None
+
+NATIVE_MODEL_JSON = "dump_json" in inspect.signature(routing.serialize_response).parameters
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson, or by pydantic when handed a model"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode()
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def app_options() -> dict:
+    """FastAPI() keyword arguments selecting the fastest encoding this FastAPI supports"""
+    return {} if NATIVE_MODEL_JSON else {"default_response_class": FastJSONResponse}
+
+def json_response(model_type: Any, value: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Validate ORM objects against a schema type and dump them to JSON bytes in one pass"""
+    adapter = _adapters.get(model_type)
+    if adapter is None:
+        adapter = _adapters[model_type] = TypeAdapter(model_type)
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,54 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
 from models import BannerDB
 from schemas import Banner, BannerCreate
 from auth import verify_admin_token
+import publisher
+import read_cache
 
 router = APIRouter(prefix="/banners", tags=["banners"])
 
+async def banners_changed(db: AsyncSession):
+    """Refresh the static banner artifacts after a committed change"""
+    try:
+        await publisher.publish_banners(db)
+    except OSError as e:
+        # Already committed, so the edit stands; publisher.py can rebuild the files later
+        print(f"Could not publish banner artifacts: {e}")
+
 @router.get("", response_model=List[Banner])
-async def get_banners(db: Session = Depends(get_db)):
-    return db.query(BannerDB).all()
+async def get_banners(active: Optional[bool] = None, db: AsyncSession = Depends(get_async_db)):
+    # Served from memory after one generation check, see read_cache
+    cached = await read_cache.banners.get(db)
+    return Response(content=cached.bodies[active], media_type="application/json")
 
 @router.post("", response_model=Banner)
 async def create_banner(
     banner: BannerCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
     db_banner = BannerDB(message=banner.message, active=banner.active)
     db.add(db_banner)
-    db.commit()
-    db.refresh(db_banner)
+    await db.commit()
+    await db.refresh(db_banner)
+    await banners_changed(db)
     return db_banner
 
 @router.put("/{banner_id}", response_model=Banner)
 async def update_banner(
     banner_id: int, 
     banner: BannerCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_banner = db.query(BannerDB).filter(BannerDB.id == banner_id).first()
+    db_banner = await db.get(BannerDB, banner_id)
     if not db_banner:
         raise HTTPException(status_code=404, detail="Banner not found")
     db_banner.message = banner.message
     db_banner.active = banner.active
-    db.commit()
-    db.refresh(db_banner)
+    await db.commit()
+    await db.refresh(db_banner)
+    await banners_changed(db)
     return db_banner
 
 @router.delete("/{banner_id}")
 async def delete_banner(
     banner_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_banner = db.query(BannerDB).filter(BannerDB.id == banner_id).first()
+    db_banner = await db.get(BannerDB, banner_id)
     if not db_banner:
         raise HTTPException(status_code=404, detail="Banner not found")
-    db.delete(db_banner)
-    db.commit()
+    await db.delete(db_banner)
+    await db.commit()
+    await banners_changed(db)
     return {"message": "Banner deleted"}
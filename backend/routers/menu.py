@@ -1,105 +1,210 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database import get_async_db
 from models import CategoryDB, MenuItemDB
-from schemas import MenuData, MenuCategory, CategoryCreate, MenuItem, MenuItemCreate
+from schemas import MenuData, MenuCategory, CategoryCreate, MenuItem, MenuItemCreate, MenuDocument, MenuImportResult, MenuChanges, MenuSearchResults, MenuSearchHit
 from auth import verify_admin_token
+import menu_cache
+import menu_io
+import menu_sync
+import publisher
+import menu_search
+import images
+import compression
 
 router = APIRouter(prefix="/menu", tags=["menu"])
 
+async def menu_changed(db: AsyncSession):
+    """Refresh everything derived from the menu after a committed change"""
+    snapshot = await menu_cache.build_snapshot(db)
+    try:
+        await publisher.publish_menu(snapshot)
+    except OSError as e:
+        # The edit is committed; the static copy catches up on the next change or publisher.py run
+        print(f"Could not publish menu artifacts: {e}")
+
+async def get_category_with_items(db: AsyncSession, cat_id: int) -> Optional[CategoryDB]:
+    result = await db.execute(
+        select(CategoryDB).options(selectinload(CategoryDB.items)).where(CategoryDB.id == cat_id)
+    )
+    return result.scalar_one_or_none()
+
 @router.get("", response_model=MenuData)
-async def get_menu(db: Session = Depends(get_db)):
-    categories = db.query(CategoryDB).all()
-    return {"categories": categories}
+async def get_menu(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    snapshot = await menu_cache.get_snapshot(db)
+    encoding = compression.negotiate(accept_encoding)
+    headers = {"ETag": snapshot.etag_for(encoding), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if menu_cache.etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    # Served pre-compressed, so the compression middleware leaves it alone
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.body_for(encoding), media_type="application/json", headers=headers)
+
+@router.get("/changes", response_model=MenuChanges)
+async def get_menu_changes(
+    since: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await menu_sync.changes_since(db, since)
+
+@router.get("/search", response_model=MenuSearchResults)
+async def search_menu(
+    q: str = Query(..., min_length=1, max_length=200),
+    spicy: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    category_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    filters = menu_search.SearchFilters(spicy=spicy, min_price=min_price, max_price=max_price, category_id=category_id)
+    hits = await menu_search.search(db, q, filters, limit)
+    return MenuSearchResults(
+        query=q,
+        backend=menu_search.backend.name,
+        results=[
+            MenuSearchHit.model_validate({**MenuItem.model_validate(item).model_dump(), "category_id": item.category_id, "score": score})
+            for item, score in hits
+        ],
+    )
 
 @router.post("/categories", response_model=MenuCategory)
 async def create_category(
     cat: CategoryCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_cat = CategoryDB(name=cat.name)
+    db_cat = CategoryDB(name=cat.name, items=[])
     db.add(db_cat)
     try:
-        db.commit()
-        db.refresh(db_cat)
-    except Exception:
-        db.rollback()
+        await db.commit()
+        await db.refresh(db_cat)
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Category already exists")
+    await menu_changed(db)
     return db_cat
 
 @router.put("/categories/{cat_id}", response_model=MenuCategory)
 async def update_category(
     cat_id: int, 
     cat: CategoryCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_cat = db.query(CategoryDB).filter(CategoryDB.id == cat_id).first()
+    db_cat = await get_category_with_items(db, cat_id)
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
     db_cat.name = cat.name
-    db.commit()
-    db.refresh(db_cat)
+    await db.commit()
+    await menu_changed(db)
     return db_cat
 
 @router.delete("/categories/{cat_id}")
 async def delete_category(
     cat_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_cat = db.query(CategoryDB).filter(CategoryDB.id == cat_id).first()
+    db_cat = await get_category_with_items(db, cat_id)
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
-    db.query(MenuItemDB).filter(MenuItemDB.category_id == cat_id).delete()
-    db.delete(db_cat)
-    db.commit()
+    # Delete through the ORM so every item gets a tombstone
+    for db_item in db_cat.items:
+        await db.delete(db_item)
+    await db.delete(db_cat)
+    await db.commit()
+    await menu_changed(db)
     return {"message": "Category deleted"}
 
 @router.post("/items", response_model=MenuItem)
 async def create_item(
     item: MenuItemCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
+    if not await menu_cache.category_exists(db, item.category_id):
+        raise HTTPException(status_code=404, detail="Category not found")
     db_item = MenuItemDB(**item.model_dump())
+    db_item.images = await images.variants_for(db_item.image_url)
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
+    await menu_changed(db)
     return db_item
 
 @router.put("/items/{item_id}", response_model=MenuItem)
 async def update_item(
     item_id: int, 
     item: MenuItemCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_item = db.query(MenuItemDB).filter(MenuItemDB.id == item_id).first()
+    db_item = await db.get(MenuItemDB, item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
-    
+    if item.category_id != db_item.category_id and not await menu_cache.category_exists(db, item.category_id):
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    # Variants belong to the old image once the URL changes
+    image_changed = item.image_url != db_item.image_url
     db_item.name = item.name
     db_item.price = item.price
     db_item.description = item.description
     db_item.spicy = item.spicy
     db_item.image_url = item.image_url
     db_item.category_id = item.category_id
-    
-    db.commit()
-    db.refresh(db_item)
+    if image_changed or db_item.images is None:
+        db_item.images = await images.variants_for(db_item.image_url)
+
+    await db.commit()
+    await db.refresh(db_item)
+    await menu_changed(db)
     return db_item
 
 @router.delete("/items/{item_id}")
 async def delete_item(
     item_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_item = db.query(MenuItemDB).filter(MenuItemDB.id == item_id).first()
+    db_item = await db.get(MenuItemDB, item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
-    db.delete(db_item)
-    db.commit()
+    await db.delete(db_item)
+    await db.commit()
+    await menu_changed(db)
     return {"message": "Item deleted"}
+
+@router.post("/import", response_model=MenuImportResult)
+async def import_menu(
+    document: MenuDocument,
+    replace: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_admin_token)
+):
+    names = [cat.name for cat in document.categories]
+    if len(names) != len(set(names)):
+        raise HTTPException(status_code=400, detail="Duplicate category names in menu document")
+    result = await db.run_sync(menu_io.apply_menu_document, document, replace)
+    await db.commit()
+    await menu_changed(db)
+    return result
+
+@router.get("/export")
+async def export_menu(_: bool = Depends(verify_admin_token)):
+    return StreamingResponse(
+        menu_io.stream_menu_document(),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="menu.json"'},
+    )
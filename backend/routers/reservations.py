@@ -1,15 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from models import ReservationDB
-from schemas import Reservation, ReservationStatusUpdate
-from auth import verify_admin_token
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, and_, or_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Literal
+from datetime import date, datetime
+import base64
+import json
+from database import get_async_db
+from models import ReservationDB, ArchivedReservationDB
+from schemas import Reservation, ReservationStatusUpdate, CalendarMonth, CalendarDay, CalendarBucket, Availability, ArchivedReservation, ArchiveResult
+from auth import verify_admin_token, verify_stream_access, create_stream_token, StreamTokenResponse, STREAM_TOKEN_EXPIRE_SECONDS
+from events import reservation_events
+from dates import parse_date, parse_time
+from responses import json_response
+import archive
+import reservation_export
+import capacity
+import reservation_queue
+import idempotency
 
 router = APIRouter(prefix="/reservations", tags=["reservations"])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(db_res: ReservationDB) -> str:
+    """Opaque keyset cursor pointing just past the given row"""
+    raw = json.dumps([db_res.created_at.isoformat(), db_res.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, res_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(res_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def reservation_filters(
+    model,
+    status: Optional[str] = None,
+    booking_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> list:
+    """WHERE conditions shared by the listing, archive and export endpoints, live or archived model"""
+    conditions = []
+    if status:
+        conditions.append(model.status == status)
+    if booking_type:
+        conditions.append(model.booking_type == booking_type)
+    if date_from:
+        conditions.append(model.date >= date_from)
+    if date_to:
+        conditions.append(model.date <= date_to)
+    return conditions
+
+async def save_reservation(
+    res_data: dict,
+    db: AsyncSession,
+    on_insert: Optional[reservation_queue.OnInsert] = None,
+) -> ReservationDB:
+    """Insert a reservation and claim its capacity; on_insert may add rows to the same transaction"""
+    if reservation_queue.writer is not None:
+        # Group-commit mode: the writer batches this row with concurrent bookings
+        try:
+            return await reservation_queue.writer.submit(res_data, on_insert)
+        except capacity.CapacityError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except reservation_queue.QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    db_res = ReservationDB(**res_data)
+    if capacity.holds_capacity(db_res.status):
+        # Check and take the seats in the same transaction as the insert
+        try:
+            await capacity.claim(db, db_res.date, db_res.time, db_res.booking_type, db_res.guests)
+        except capacity.CapacityError as e:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+    db.add(db_res)
+    if on_insert is not None:
+        await db.flush()
+        on_insert(db, db_res)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    await db.refresh(db_res)
+    return db_res
+
 @router.post("", response_model=Reservation)
-async def create_reservation(res: Reservation, db: Session = Depends(get_db)):
+async def create_reservation(
+    res: Reservation,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     # Create DB object - exclude id if present (it's auto-generated) and status (default pending)
     # We use model_dump(exclude={'id', 'status'}) but we want to allow status if passed? 
     # Actually for creation, we usually ignore passed status and set it to pending.
@@ -17,43 +104,291 @@ async def create_reservation(res: Reservation, db: Session = Depends(get_db)):
     # Force default status on create if not provided or override it to be safe
     if 'status' not in res_data or not res_data['status']:
         res_data['status'] = 'pending'
-        
-    db_res = ReservationDB(**res_data)
-    db.add(db_res)
-    db.commit()
-    db.refresh(db_res)
-    return db_res
+    try:
+        res_data['date'] = parse_date(res.date)
+        res_data['time'] = parse_time(res.time)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Retries and double taps get the first answer back instead of a second booking
+    request_fingerprint = idempotency.fingerprint(res.model_dump(exclude={'id'}))
+    try:
+        key, ttl = idempotency.request_key("reservations", idempotency_key, request_fingerprint)
+        stored = await idempotency.store.claim(key, request_fingerprint, ttl)
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if stored is not None:
+        return Response(
+            content=stored.body, status_code=stored.status_code,
+            media_type="application/json", headers={"Idempotent-Replayed": "true"},
+        )
+
+    responses = []
+
+    def record_created(session: AsyncSession, db_res: ReservationDB):
+        # Committed together with the reservation, so either all exist or none does
+        created = Reservation.model_validate(db_res)
+        responses.append(idempotency.StoredResponse(request_fingerprint, 200, created.model_dump_json().encode()))
+        idempotency.store.record(session, key, responses[-1], ttl)
+        reservation_events.record(session, "created", created.model_dump())
+
+    try:
+        await save_reservation(res_data, db, record_created)
+    except IntegrityError:
+        # Another worker committed this key first, answer with its response
+        stored = await idempotency.store.lookup(key)
+        await idempotency.store.release(key)
+        if stored is None:
+            raise
+        try:
+            stored = idempotency.matching(stored, request_fingerprint)
+        except idempotency.IdempotencyError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        return Response(
+            content=stored.body, status_code=stored.status_code,
+            media_type="application/json", headers={"Idempotent-Replayed": "true"},
+        )
+    except BaseException:
+        await idempotency.store.release(key)
+        raise
+    stored = responses[-1]
+    await idempotency.store.complete(key, stored, ttl)
+    reservation_events.notify()
+    return Response(content=stored.body, media_type="application/json")
 
 @router.get("", response_model=List[Reservation])
-async def get_reservations(db: Session = Depends(get_db)):
-    return db.query(ReservationDB).all()
+async def get_reservations(
+    status: Optional[str] = None,
+    booking_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_admin_token)
+):
+    # date_from/date_to become a range scan on the (date, status) index
+    query = select(ReservationDB).where(*reservation_filters(ReservationDB, status, booking_type, date_from, date_to))
+
+    # Keyset pagination over (created_at, id) which is unique and never changes
+    if cursor:
+        created_at, res_id = decode_cursor(cursor)
+        if order == "asc":
+            query = query.where(or_(
+                ReservationDB.created_at > created_at,
+                and_(ReservationDB.created_at == created_at, ReservationDB.id > res_id)
+            ))
+        else:
+            query = query.where(or_(
+                ReservationDB.created_at < created_at,
+                and_(ReservationDB.created_at == created_at, ReservationDB.id < res_id)
+            ))
+    if order == "asc":
+        query = query.order_by(ReservationDB.created_at.asc(), ReservationDB.id.asc())
+    else:
+        query = query.order_by(ReservationDB.created_at.desc(), ReservationDB.id.desc())
+
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.scalars().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return json_response(List[Reservation], rows, headers)
+
+@router.get("/availability", response_model=Availability)
+async def get_availability(
+    day: date = Query(..., alias="date"),
+    booking_type: str = "table",
+    guests: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await capacity.availability(db, day=day.isoformat(), booking_type=booking_type, guests=guests)
+
+@router.get("/calendar", response_model=CalendarMonth)
+async def get_calendar_month(
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="Month as YYYY-MM"),
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_admin_token)
+):
+    year, month_num = (int(part) for part in month.split("-"))
+    if not 1 <= month_num <= 12:
+        raise HTTPException(status_code=400, detail="Invalid month")
+    start = date(year, month_num, 1)
+    end = date(year + 1, 1, 1) if month_num == 12 else date(year, month_num + 1, 1)
+
+    # One GROUP BY over the month's slice of the (date, status) index
+    result = await db.execute(
+        select(
+            ReservationDB.date,
+            ReservationDB.status,
+            ReservationDB.booking_type,
+            func.count(ReservationDB.id),
+            func.coalesce(func.sum(ReservationDB.guests), 0),
+        )
+        .where(ReservationDB.date >= start, ReservationDB.date < end)
+        .group_by(ReservationDB.date, ReservationDB.status, ReservationDB.booking_type)
+        .order_by(ReservationDB.date)
+    )
+
+    days = {}
+    for day, res_status, booking_type, count, guests in result.all():
+        entry = days.setdefault(day, CalendarDay(date=day.isoformat(), count=0, guests=0, breakdown=[]))
+        entry.count += count
+        entry.guests += guests
+        entry.breakdown.append(CalendarBucket(status=res_status, booking_type=booking_type, count=count, guests=guests))
+    return CalendarMonth(month=month, days=list(days.values()))
+
+@router.get("/calendar/{day}", response_model=List[Reservation])
+async def get_calendar_day(
+    day: date,
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_admin_token)
+):
+    # Served by the (date, time) index in booking order
+    query = select(ReservationDB).where(ReservationDB.date == day)
+    if status:
+        query = query.where(ReservationDB.status == status)
+    result = await db.execute(query.order_by(ReservationDB.time, ReservationDB.id))
+    return json_response(List[Reservation], result.scalars().all())
+
+@router.post("/archive", response_model=ArchiveResult)
+async def archive_reservations(
+    days: int = Query(archive.ARCHIVE_AFTER_DAYS, ge=0),
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_admin_token)
+):
+    result = await archive.archive_reservations(db, days=days, dry_run=dry_run)
+    if result.archived and not dry_run:
+        reservation_events.record(db, "archived", result.model_dump())
+        await db.commit()
+        reservation_events.notify()
+    return result
+
+@router.get("/archive", response_model=List[ArchivedReservation])
+async def get_archived_reservations(
+    status: Optional[str] = None,
+    booking_type: Optional[str] = None,
+    email: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_admin_token)
+):
+    """Archived bookings, most recently archived first"""
+    query = select(ArchivedReservationDB).where(
+        *reservation_filters(ArchivedReservationDB, status, booking_type, date_from, date_to)
+    )
+    if email:
+        query = query.where(ArchivedReservationDB.email == email)
+    if cursor:
+        query = query.where(ArchivedReservationDB.archive_id < cursor)
+
+    result = await db.execute(query.order_by(ArchivedReservationDB.archive_id.desc()).limit(limit + 1))
+    rows = result.scalars().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].archive_id)
+    return json_response(List[ArchivedReservation], rows, headers)
+
+@router.get("/export")
+async def export_reservations(
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    archived: bool = False,
+    status: Optional[str] = None,
+    booking_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    _: bool = Depends(verify_admin_token)
+):
+    """Stream matching reservations, live or archived, for spreadsheets and accounting"""
+    model = ArchivedReservationDB if archived else ReservationDB
+    columns = reservation_export.EXPORT_COLUMNS + (["archived_at"] if archived else [])
+    query = (
+        select(*[getattr(model, name) for name in columns])
+        .where(*reservation_filters(model, status, booking_type, date_from, date_to))
+        .order_by(model.date, model.time, model.id)
+    )
+
+    filename = f"{'reservations-archive' if archived else 'reservations'}.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        reservation_export.stream_reservations(query, columns, format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/events/token", response_model=StreamTokenResponse)
+async def create_event_stream_token(_: bool = Depends(verify_admin_token)):
+    """Token for ?token= on GET /reservations/events, good for connecting within a minute"""
+    return StreamTokenResponse(token=create_stream_token(), expires_in=STREAM_TOKEN_EXPIRE_SECONDS)
+
+@router.get("/events")
+async def reservation_event_stream(
+    request: Request,
+    _: bool = Depends(verify_stream_access)
+):
+    queue = reservation_events.subscribe()
+    return StreamingResponse(
+        reservation_events.stream(queue, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.put("/{reservation_id}", response_model=Reservation)
 async def update_reservation_status(
     reservation_id: int, 
     update_data: ReservationStatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_res = db.query(ReservationDB).filter(ReservationDB.id == reservation_id).first()
+    db_res = await db.get(ReservationDB, reservation_id)
     if not db_res:
         raise HTTPException(status_code=404, detail="Reservation not found")
     
+    was_holding = capacity.holds_capacity(db_res.status)
+    now_holding = capacity.holds_capacity(update_data.status)
+    if was_holding and not now_holding:
+        await capacity.release(db, db_res.date, db_res.time, db_res.booking_type, db_res.guests)
+    elif now_holding and not was_holding:
+        try:
+            await capacity.claim(db, db_res.date, db_res.time, db_res.booking_type, db_res.guests)
+        except capacity.CapacityError as e:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+
     db_res.status = update_data.status
-    db.commit()
-    db.refresh(db_res)
+    reservation_events.record(db, "status_changed", Reservation.model_validate(db_res).model_dump())
+    await db.commit()
+    await db.refresh(db_res)
+    reservation_events.notify()
     return db_res
 
 @router.delete("/{reservation_id}")
 async def delete_reservation(
     reservation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_admin_token)
 ):
-    db_res = db.query(ReservationDB).filter(ReservationDB.id == reservation_id).first()
+    db_res = await db.get(ReservationDB, reservation_id)
     if not db_res:
         raise HTTPException(status_code=404, detail="Reservation not found")
     
-    db.delete(db_res)
-    db.commit()
+    if capacity.holds_capacity(db_res.status):
+        await capacity.release(db, db_res.date, db_res.time, db_res.booking_type, db_res.guests)
+    await db.delete(db_res)
+    reservation_events.record(db, "deleted", {"id": reservation_id})
+    await db.commit()
+    reservation_events.notify()
     return {"message": "Reservation deleted successfully", "id": reservation_id}
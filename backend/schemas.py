@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional
+from datetime import date, datetime, time
+from dates import format_date, format_time
 
 class MenuItemBase(BaseModel):
     name: str
@@ -8,8 +10,22 @@ class MenuItemBase(BaseModel):
     spicy: Optional[bool] = False
     image_url: Optional[str] = None
 
+class ImageVariant(BaseModel):
+    format: str  # avif or webp
+    width: int
+    height: int
+    url: str
+
+class ImageSet(BaseModel):
+    """Resized copies of image_url; srcset maps each format to a ready-made srcset string"""
+    width: int
+    height: int
+    srcset: Dict[str, str]
+    variants: List[ImageVariant]
+
 class MenuItem(MenuItemBase):
     id: int
+    images: Optional[ImageSet] = None
     class Config:
         from_attributes = True
 
@@ -28,6 +44,49 @@ class MenuData(BaseModel):
 class MenuItemCreate(MenuItemBase):
     category_id: int
 
+class CategoryChange(MenuCategoryBase):
+    id: int
+    version: Optional[int] = None
+    class Config:
+        from_attributes = True
+
+class MenuItemChange(MenuItem):
+    category_id: Optional[int] = None
+    version: Optional[int] = None
+
+class MenuSearchHit(MenuItem):
+    category_id: Optional[int] = None
+    score: float
+
+class MenuSearchResults(BaseModel):
+    query: str
+    backend: str
+    results: List[MenuSearchHit]
+
+class MenuChanges(BaseModel):
+    """Delta since a client's version; apply deletions before upserts"""
+    version: int
+    full: bool  # True when the client should replace its copy instead of merging
+    categories: List[CategoryChange]
+    items: List[MenuItemChange]
+    deleted_categories: List[int]
+    deleted_items: List[int]
+
+class MenuDocumentCategory(MenuCategoryBase):
+    items: List[MenuItemBase] = []
+
+class MenuDocument(BaseModel):
+    """Whole-menu document in the same shape as data/menu.json"""
+    categories: List[MenuDocumentCategory]
+
+class MenuImportResult(BaseModel):
+    categories_created: int = 0
+    categories_deleted: int = 0
+    items_created: int = 0
+    items_updated: int = 0
+    items_unchanged: int = 0
+    items_deleted: int = 0
+
 class CategoryCreate(MenuCategoryBase):
     pass
 
@@ -49,9 +108,60 @@ class Reservation(BaseModel):
     class Config:
         from_attributes = True
 
+    # Stored as DATE/TIME columns, still exchanged as YYYY-MM-DD and HH:MM strings
+    @field_validator("date", mode="before")
+    @classmethod
+    def date_to_text(cls, value):
+        return format_date(value) if value is None or isinstance(value, date) else value
+
+    @field_validator("time", mode="before")
+    @classmethod
+    def time_to_text(cls, value):
+        return format_time(value) if value is None or isinstance(value, time) else value
+
+class ArchivedReservation(Reservation):
+    created_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None
+
+class ArchiveResult(BaseModel):
+    horizon: str  # bookings dated before this day were archived, closed ones up to yesterday
+    archived: int = 0
+    batches: int = 0
+    export_path: Optional[str] = None
+
 class ReservationStatusUpdate(BaseModel):
     status: str
 
+class SlotAvailability(BaseModel):
+    time: Optional[str] = None  # None for booking types limited per day
+    booked_guests: int
+    booked_bookings: int
+    remaining_guests: Optional[int] = None
+    remaining_bookings: Optional[int] = None
+    available: bool
+
+class Availability(BaseModel):
+    date: str
+    booking_type: str
+    blackout: bool
+    slots: List[SlotAvailability]
+
+class CalendarBucket(BaseModel):
+    status: Optional[str] = None
+    booking_type: Optional[str] = None
+    count: int
+    guests: int
+
+class CalendarDay(BaseModel):
+    date: str
+    count: int
+    guests: int
+    breakdown: List[CalendarBucket]
+
+class CalendarMonth(BaseModel):
+    month: str
+    days: List[CalendarDay]
+
 class BannerBase(BaseModel):
     message: str
     active: Optional[bool] = True
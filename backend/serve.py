@@ -0,0 +1,101 @@
+"""Production server: gunicorn supervising uvicorn workers.
+
+    python serve.py                    # 0.0.0.0:$PORT, one worker per available CPU
+    WEB_CONCURRENCY=4 python serve.py
+
+The master imports the app and runs the one-time startup work (schema,
+migrations, search setup, occupancy, seeding) before it forks, so workers
+start warm and seeding never races between them. Each worker drops the
+database connections it inherited, is replaced after MAX_REQUESTS_PER_WORKER
+requests (with jitter, so they do not all restart at once), and on SIGTERM
+stops accepting connections and finishes in-flight requests for up to
+GRACEFUL_TIMEOUT seconds before its shutdown handlers run.
+
+The in-memory caches are per worker; idempotency keys and the admin event
+stream are shared through the database. Rate-limit budgets are too when there
+is more than one worker (RATE_LIMIT_STORE=database unless set otherwise); a
+single worker keeps them in memory and spares each limited request a write.
+"""
+import math
+import time
+import os
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+PORT = int(os.getenv("PORT", "8000"))
+MAX_REQUESTS_PER_WORKER = int(os.getenv("MAX_REQUESTS_PER_WORKER", "10000"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+def available_cpus() -> int:
+    """CPUs this process may run on, capped by a cgroup v2 CPU quota when in a container"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, count)
+
+def release_connections():
+    """Drop pooled connections without closing them, they belong to the parent process"""
+    from database import engine, async_engine
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+def post_fork(server, worker):
+    release_connections()
+
+class Worker(UvicornWorker):
+    """Uvicorn worker that gives up on lingering connections, such as event streams,
+    early enough for the shutdown handlers to run before gunicorn kills it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = max(1, self.cfg.graceful_timeout - 5)
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Runs once in the master because of preload_app
+        import main
+        main.startup_summary = main.prepare()
+        # The master opened connections for the startup work; close them before forking
+        from database import engine, async_engine
+        engine.dispose()
+        async_engine.sync_engine.dispose()
+        elapsed_ms = (time.perf_counter() - main.BOOT_STARTED) * 1000
+        print(f"Startup finished in {elapsed_ms:.0f} ms ({main.startup_summary})")
+        return main.app
+
+def options() -> dict:
+    return {
+        "bind": f"0.0.0.0:{PORT}",
+        "workers": int(os.getenv("WEB_CONCURRENCY") or available_cpus()),
+        "worker_class": "serve.Worker",
+        "preload_app": True,
+        "max_requests": MAX_REQUESTS_PER_WORKER,
+        "max_requests_jitter": MAX_REQUESTS_PER_WORKER // 10,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": 60,
+        "keepalive": 5,
+        "post_fork": post_fork,
+    }
+
+if __name__ == "__main__":
+    config = options()
+    # Read when the master imports the app, so it has to be decided before that
+    if config["workers"] > 1:
+        os.environ.setdefault("RATE_LIMIT_STORE", "database")
+    Server(config).run()
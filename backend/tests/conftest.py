@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time, so point it at a throwaway database first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="dosa-point-tests-"), "test.db")
+os.environ.setdefault("ADMIN_PASSWORD", "test")
+os.environ["RESERVATION_WRITE_MODE"] = "direct"
+# Tests make many requests from one address; the limiter has its own tests
+os.environ["RATE_LIMIT_RESERVATIONS"] = "off"
+os.environ["RATE_LIMIT_LOGIN"] = "off"
+
+# Modules live flat in backend/, as when the app is run from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its startup work done, seeded from data/"""
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def admin_headers():
+    from auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'admin': True})}"}
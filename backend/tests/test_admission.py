@@ -0,0 +1,135 @@
+"""Rate limits, load shedding and client addresses in the admission middleware."""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import delete
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import admission
+from admission import AdmissionMiddleware, RateLimit, SharedBuckets, TokenBuckets, client_address
+from bootstrap import ensure_schema
+from database import SessionLocal, async_engine
+from models import RateLimitDB
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    monkeypatch.setattr(admission.time, "time", clock)
+    return clock
+
+def make_app(release: asyncio.Event = None, **options):
+    async def book(request):
+        if release is not None:
+            await release.wait()
+        return PlainTextResponse("ok")
+    app = Starlette(routes=[Route("/book", book, methods=["GET", "POST"])])
+    return AdmissionMiddleware(app, **options)
+
+def send(app, *requests):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app, client=("203.0.113.7", 5000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return [await http.request(method, "/book", headers=headers) for method, headers in requests]
+    return asyncio.run(scenario())
+
+def test_token_bucket_refills_at_the_configured_rate(clock):
+    buckets, limit = TokenBuckets(), RateLimit.parse("2/10")
+    assert buckets.take(("/book", "a"), limit) == 0
+    assert buckets.take(("/book", "a"), limit) == 0
+    assert buckets.take(("/book", "a"), limit) == pytest.approx(5)
+    clock.now += 5
+    assert buckets.take(("/book", "a"), limit) == 0
+    # Other clients have their own bucket
+    assert buckets.take(("/book", "b"), limit) == 0
+
+def test_shared_buckets_refill_like_gcra(clock):
+    ensure_schema()
+    db = SessionLocal()
+    db.execute(delete(RateLimitDB))
+    db.commit()
+    db.close()
+
+    async def scenario():
+        shared, limit = SharedBuckets(), RateLimit.parse("2/10")
+        waits = [await shared.take(("/book", "a"), limit) for _ in range(3)]
+        clock.now += 5
+        waits.append(await shared.take(("/book", "a"), limit))
+        waits.append(await shared.take(("/book", "a"), limit))
+        # A second worker draws on the same budget
+        waits.append(await SharedBuckets().take(("/book", "a"), limit))
+        return waits
+    try:
+        waits = asyncio.run(scenario())
+    finally:
+        asyncio.run(async_engine.dispose())
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(5)
+    assert waits[3] == 0
+    assert waits[4] == pytest.approx(5)
+    assert waits[5] == pytest.approx(5)
+
+def test_memory_store_is_the_default():
+    assert admission.RATE_LIMIT_STORE == "memory"
+    assert make_app().shared is None
+
+def test_over_the_limit_gets_429_with_retry_after(clock):
+    app = make_app(rate_limits={("POST", "/book"): RateLimit.parse("2/60")})
+    responses = send(app, ("POST", {}), ("POST", {}), ("POST", {}), ("GET", {}))
+    assert [response.status_code for response in responses] == [200, 200, 429, 200]
+    assert responses[2].headers["Retry-After"] == "30"
+
+def test_concurrency_cap_sheds_with_503():
+    async def scenario():
+        release = asyncio.Event()
+        app = make_app(release, rate_limits={}, max_requests=2, max_writes=1)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            held = [asyncio.create_task(http.get("/book")), asyncio.create_task(http.post("/book"))]
+            await asyncio.sleep(0.05)
+            shed_write = await http.post("/book")
+            shed_read = await http.get("/book")
+            release.set()
+            finished = await asyncio.gather(*held)
+            after = await http.get("/book")
+        return shed_write, shed_read, finished, after
+    shed_write, shed_read, finished, after = asyncio.run(scenario())
+    assert shed_write.status_code == shed_read.status_code == 503
+    assert shed_write.headers["Retry-After"] == "1"
+    assert [response.status_code for response in finished] == [200, 200]
+    assert after.status_code == 200
+
+@pytest.mark.parametrize("hops, forwarded, expected", [
+    (0, "198.51.100.1", "203.0.113.7"),
+    (1, "198.51.100.1", "198.51.100.1"),
+    (1, "10.0.0.1, 198.51.100.1", "198.51.100.1"),
+    (2, "10.0.0.1, 198.51.100.1, 192.0.2.9", "198.51.100.1"),
+    # Fewer entries than trusted proxies means the header was not set by them
+    (2, "198.51.100.1", "203.0.113.7"),
+])
+def test_client_address_trusts_only_the_configured_hops(monkeypatch, hops, forwarded, expected):
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", hops)
+    scope = {"client": ("203.0.113.7", 5000)}
+    assert client_address(scope, Headers({"x-forwarded-for": forwarded})) == expected
+
+def test_forwarded_clients_get_separate_budgets(clock, monkeypatch):
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", 1)
+    app = make_app(rate_limits={("POST", "/book"): RateLimit.parse("1/60")})
+    responses = send(
+        app,
+        ("POST", {"X-Forwarded-For": "198.51.100.1"}),
+        ("POST", {"X-Forwarded-For": "198.51.100.2"}),
+        ("POST", {"X-Forwarded-For": "198.51.100.1"}),
+    )
+    assert [response.status_code for response in responses] == [200, 200, 429]
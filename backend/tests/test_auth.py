@@ -0,0 +1,43 @@
+"""Admin tokens versus the short-lived event stream tokens."""
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+import auth
+
+def stream_token(client, admin_headers) -> str:
+    response = client.post("/reservations/events/token", headers=admin_headers)
+    assert response.status_code == 200
+    return response.json()["token"]
+
+def test_stream_token_requires_admin(client):
+    assert client.post("/reservations/events/token").status_code == 401
+
+def test_stream_token_is_not_an_admin_bearer_token(client, admin_headers):
+    token = stream_token(client, admin_headers)
+    response = client.get("/reservations/calendar", params={"month": "2030-06"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_scoped_token_with_admin_claim_is_refused_as_bearer(client):
+    token = jwt.encode(
+        {"admin": True, "scope": auth.STREAM_SCOPE, "exp": datetime.utcnow() + timedelta(minutes=1)},
+        auth.SECRET_KEY, algorithm=auth.ALGORITHM,
+    )
+    response = client.get("/reservations/calendar", params={"month": "2030-06"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_admin_token_still_works_as_bearer(client, admin_headers):
+    response = client.get("/reservations/calendar", params={"month": "2030-06"}, headers=admin_headers)
+    assert response.status_code == 200
+
+def test_event_stream_refuses_admin_token_in_url(client, admin_headers):
+    admin_token = admin_headers["Authorization"].split(" ", 1)[1]
+    assert client.get("/reservations/events", params={"token": admin_token}).status_code == 401
+    assert client.get("/reservations/events").status_code == 401
+
+def test_expired_stream_token_is_refused(client):
+    token = jwt.encode(
+        {"scope": auth.STREAM_SCOPE, "exp": datetime.utcnow() - timedelta(seconds=5)},
+        auth.SECRET_KEY, algorithm=auth.ALGORITHM,
+    )
+    assert client.get("/reservations/events", params={"token": token}).status_code == 401
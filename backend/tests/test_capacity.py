@@ -0,0 +1,97 @@
+"""Concurrent bookings for one slot must never take more than its capacity."""
+import asyncio
+from datetime import date, time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+
+import capacity
+import reservation_queue
+from bootstrap import ensure_schema
+from database import AsyncSessionLocal, async_engine
+from models import ReservationDB, SlotOccupancyDB
+from routers.reservations import save_reservation
+
+BOOKING_DATE = date(2030, 6, 1)
+BOOKING_TIME = time(19, 0)
+ATTEMPTS = 40
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    ensure_schema()
+    asyncio.run(clear_reservations())
+    yield
+
+async def clear_reservations():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ReservationDB))
+        await db.execute(delete(SlotOccupancyDB))
+        await db.commit()
+    await async_engine.dispose()
+
+@pytest.fixture(params=["direct", "batched"])
+def write_mode(request, monkeypatch):
+    writer = reservation_queue.GroupCommitWriter(batch_size=8, delay_ms=5) if request.param == "batched" else None
+    monkeypatch.setattr(reservation_queue, "writer", writer)
+    return request.param
+
+def limit_table_bookings(monkeypatch, **limits):
+    config = capacity.CapacityConfig(booking_types={"table": capacity.BookingRule(**limits)})
+    monkeypatch.setattr(capacity, "config", config)
+
+def booking(guests: int, n: int) -> dict:
+    return {
+        "name": f"Guest {n}", "email": f"guest{n}@example.com", "phone": "555-0100",
+        "date": BOOKING_DATE, "time": BOOKING_TIME, "guests": guests,
+        "status": "pending", "booking_type": "table",
+    }
+
+async def book_concurrently(guests: int) -> int:
+    """Fire ATTEMPTS bookings for the same slot at once, each in its own session, returning how many succeeded"""
+    async def attempt(n: int) -> bool:
+        async with AsyncSessionLocal() as db:
+            try:
+                await save_reservation(booking(guests, n), db)
+            except HTTPException as e:
+                assert e.status_code == 409
+                return False
+        return True
+
+    try:
+        results = await asyncio.gather(*(attempt(n) for n in range(ATTEMPTS)))
+    finally:
+        if reservation_queue.writer is not None:
+            await reservation_queue.writer.stop()
+    return sum(results)
+
+async def stored_totals():
+    async with AsyncSessionLocal() as db:
+        count, guests = (await db.execute(
+            select(func.count(ReservationDB.id), func.coalesce(func.sum(ReservationDB.guests), 0))
+        )).one()
+        occupancy = (await db.scalars(select(SlotOccupancyDB))).all()
+    await async_engine.dispose()
+    return count, guests, occupancy
+
+def test_concurrent_claims_never_exceed_guest_capacity(write_mode, monkeypatch):
+    limit_table_bookings(monkeypatch, max_guests=20)
+
+    accepted = asyncio.run(book_concurrently(guests=3))
+    count, guests, occupancy = asyncio.run(stored_totals())
+
+    # 6 parties of 3 fit in 20 seats, the 7th would need 21
+    assert accepted == 6
+    assert count == accepted
+    assert guests == 18
+    assert [(row.guests, row.bookings) for row in occupancy] == [(18, 6)]
+
+def test_concurrent_claims_never_exceed_booking_capacity(write_mode, monkeypatch):
+    limit_table_bookings(monkeypatch, max_bookings=5)
+
+    accepted = asyncio.run(book_concurrently(guests=2))
+    count, guests, occupancy = asyncio.run(stored_totals())
+
+    assert accepted == 5
+    assert count == 5
+    assert [(row.guests, row.bookings) for row in occupancy] == [(10, 5)]
@@ -0,0 +1,146 @@
+"""Content negotiation, compression and ETags."""
+import asyncio
+import json
+import zlib
+
+import brotli
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from compression import CompressionMiddleware, negotiate
+
+ENCODINGS = ["br", "gzip", "identity"]
+
+def decode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.decompress(body)
+    if encoding == "gzip":
+        return zlib.decompress(body, 31)
+    return body
+
+@pytest.mark.parametrize("header, expected", [
+    ("br, gzip", "br"),
+    ("gzip, deflate", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+    ("gzip;q=0, identity", None),
+    (None, None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_menu_is_served_in_each_encoding_with_its_own_etag(client, encoding):
+    response = client.get("/menu", headers={"Accept-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == (None if encoding == "identity" else encoding)
+    assert "Accept-Encoding" in response.headers["Vary"]
+    # httpx has already decoded the body
+    assert "categories" in response.json()
+    etag = response.headers["ETag"]
+    assert etag.endswith(f'-{encoding}"') == (encoding != "identity")
+
+    cached = client.get("/menu", headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert "Accept-Encoding" in cached.headers["Vary"]
+    assert cached.content == b""
+
+def test_menu_etags_differ_per_encoding(client):
+    etags = {client.get("/menu", headers={"Accept-Encoding": encoding}).headers["ETag"] for encoding in ENCODINGS}
+    assert len(etags) == 3
+
+def test_stale_etag_gets_the_full_menu(client):
+    response = client.get("/menu", headers={"Accept-Encoding": "gzip", "If-None-Match": '"stale-gzip"'})
+    assert response.status_code == 200
+
+# A bare app, so what reaches the client is exactly what the middleware sent
+LARGE = {"rows": ["reservation"] * 500}
+
+async def large_json(request):
+    return JSONResponse(LARGE)
+
+async def small_json(request):
+    return JSONResponse({"ok": True})
+
+async def csv_stream(request):
+    async def rows():
+        yield b"id,name\n"
+        for n in range(3):
+            yield f"{n},guest\n".encode() * 200
+    return StreamingResponse(rows(), media_type="text/csv")
+
+async def gzip_stream(request):
+    async def chunks():
+        yield zlib.compress(b"already compressed", wbits=31)
+    return StreamingResponse(chunks(), media_type="application/gzip")
+
+async def event_stream(request):
+    async def events():
+        for n in range(3):
+            yield f"event: created\ndata: {json.dumps({'id': n, 'pad': 'x' * 600})}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+app = CompressionMiddleware(Starlette(routes=[
+    Route("/large", large_json), Route("/small", small_json), Route("/csv", csv_stream),
+    Route("/gzip", gzip_stream), Route("/events", event_stream),
+]))
+
+def fetch(path: str, encoding: str):
+    """Status, headers and the raw body as sent, before any decoding"""
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            async with http.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+                chunks = [chunk async for chunk in response.aiter_raw()]
+                return response.status_code, response.headers, chunks
+    return asyncio.run(request())
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_large_bodies_are_compressed_as_negotiated(encoding):
+    status, headers, chunks = fetch("/large", encoding)
+    assert status == 200
+    assert headers.get("Content-Encoding") == (None if encoding == "identity" else encoding)
+    body = b"".join(chunks)
+    assert headers["Content-Length"] == str(len(body))
+    assert json.loads(decode(body, encoding)) == LARGE
+    if encoding != "identity":
+        assert "Accept-Encoding" in headers["Vary"]
+
+def test_small_bodies_are_sent_as_they_are():
+    status, headers, chunks = fetch("/small", "br, gzip")
+    assert "Content-Encoding" not in headers
+    assert "Accept-Encoding" in headers["Vary"]
+    assert json.loads(b"".join(chunks)) == {"ok": True}
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_text_streams_are_compressed_chunk_by_chunk(encoding):
+    status, headers, chunks = fetch("/csv", encoding)
+    assert headers["Content-Encoding"] == encoding
+    assert "Content-Length" not in headers
+    assert decode(b"".join(chunks), encoding).decode().startswith("id,name\n0,guest\n")
+
+@pytest.mark.parametrize("path, content_type", [
+    ("/gzip", "application/gzip"),
+    ("/events", "text/event-stream"),
+])
+def test_precompressed_and_event_streams_are_not_compressed(path, content_type):
+    status, headers, chunks = fetch(path, "br, gzip")
+    assert status == 200
+    assert headers["Content-Type"].startswith(content_type)
+    assert "Content-Encoding" not in headers
+    body = b"".join(chunks)
+    if path == "/events":
+        assert body.decode().count("event: created") == 3
+    else:
+        assert zlib.decompress(body, 31) == b"already compressed"
+
+def test_export_download_is_not_compressed_twice(client, admin_headers):
+    response = client.get("/reservations/export", params={"gzip": "true"}, headers={**admin_headers, "Accept-Encoding": "br, gzip"})
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert zlib.decompress(response.content, 31).decode().startswith("id,created_at,")
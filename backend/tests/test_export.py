@@ -0,0 +1,77 @@
+"""Streaming reservation exports."""
+import asyncio
+import csv
+import io
+import zlib
+from datetime import date, time
+
+import pytest
+from sqlalchemy import delete, select
+
+import reservation_export
+from database import SessionLocal, async_engine
+from models import ReservationDB
+from reservation_export import EXPORT_COLUMNS, csv_safe, stream_reservations
+
+@pytest.fixture
+def reservations(client, monkeypatch):
+    monkeypatch.setattr(reservation_export, "FETCH_SIZE", 10)
+    db = SessionLocal()
+    db.execute(delete(ReservationDB))
+    db.add_all(
+        ReservationDB(name=f"Guest {n}", email="guest@example.com", phone="+1 (613) 555-0142",
+                      date=date(2030, 6, 1), time=time(19, 0), guests=2, special_requests="=HYPERLINK(\"x\")")
+        for n in range(25)
+    )
+    db.commit()
+    db.close()
+    yield
+    db = SessionLocal()
+    db.execute(delete(ReservationDB))
+    db.commit()
+    db.close()
+
+def export_chunks(**options) -> list:
+    async def collect():
+        query = select(*[getattr(ReservationDB, name) for name in EXPORT_COLUMNS]).order_by(ReservationDB.id)
+        return [chunk async for chunk in stream_reservations(query, EXPORT_COLUMNS, **options)]
+    try:
+        return asyncio.run(collect())
+    finally:
+        asyncio.run(async_engine.dispose())
+
+def test_gzip_chunks_decode_as_they_arrive(reservations):
+    chunks = export_chunks(compress=True)
+    assert all(chunks)
+    decoder = zlib.decompressobj(31)
+    # The header row is readable from the first chunk alone
+    assert decoder.decompress(chunks[0]).decode().startswith("id,created_at,")
+    # One chunk per partition of FETCH_SIZE rows, each complete on its own, then the gzip trailer
+    assert [decoder.decompress(chunk).decode().count("\n") for chunk in chunks[1:]] == [10, 10, 5, 0]
+    text = zlib.decompress(b"".join(chunks), 31).decode()
+    assert len(list(csv.reader(io.StringIO(text)))) == 26
+
+def test_plain_export_sends_header_first(reservations):
+    chunks = export_chunks()
+    assert all(chunks)
+    assert chunks[0].decode().startswith("id,created_at,")
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 25
+    assert rows[0]["phone"] == "+1 (613) 555-0142"
+    assert rows[0]["special_requests"] == "'=HYPERLINK(\"x\")"
+
+@pytest.mark.parametrize("value, expected", [
+    ("+1 (613) 555-0142", "+1 (613) 555-0142"),
+    ("+16135550142", "+16135550142"),
+    ("-12.50", "-12.50"),
+    ("613-555-0142", "613-555-0142"),
+    ("=1+2", "'=1+2"),
+    ("@SUM(A1)", "'@SUM(A1)"),
+    ("+SUM(A1:A9)", "'+SUM(A1:A9)"),
+    ("-1+cmd|' /C calc'!A0", "'-1+cmd|' /C calc'!A0"),
+    ("\t=1", "'\t=1"),
+    ("\r=1", "'\r=1"),
+    ("plain text", "plain text"),
+])
+def test_csv_safe_guards_formulas_but_not_numbers(value, expected):
+    assert csv_safe([value, 3, None]) == [expected, 3, None]
@@ -0,0 +1,157 @@
+"""Repeated reservation requests must be answered once and replayed after that."""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+
+import idempotency
+import main
+from database import AsyncSessionLocal, SessionLocal, async_engine
+from idempotency import DatabaseStore, IdempotencyError, MemoryStore, StoredResponse
+from models import IdempotencyKeyDB, ReservationDB
+
+BOOKING = {"name": "Asha", "email": "asha@example.com", "phone": "613-555-0142", "date": "2030-07-01", "time": "19:00", "guests": 2}
+
+def stored(body: bytes = b'{"id": 1}', request_fingerprint: str = "fp") -> StoredResponse:
+    return StoredResponse(request_fingerprint, 200, body)
+
+def reservation_count() -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(ReservationDB))
+    finally:
+        db.close()
+
+@pytest.fixture(autouse=True)
+def clean_tables(client):
+    db = SessionLocal()
+    db.execute(delete(ReservationDB))
+    db.execute(delete(IdempotencyKeyDB))
+    db.commit()
+    db.close()
+
+@pytest.fixture
+def fresh_store(monkeypatch):
+    """A store with an empty local cache, as in a worker that has not seen the key"""
+    def install(store):
+        monkeypatch.setattr(idempotency, "store", store)
+        return store
+    return install
+
+def test_memory_store_makes_a_repeat_wait_for_the_first_request():
+    async def scenario():
+        store = MemoryStore()
+        assert await store.claim("k", "fp", 60) is None
+        waiter = asyncio.create_task(store.claim("k", "fp", 60))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await store.complete("k", stored(), 60)
+        return await waiter
+    assert asyncio.run(scenario()) == stored()
+
+def test_memory_store_release_lets_a_repeat_run():
+    async def scenario():
+        store = MemoryStore()
+        await store.claim("k", "fp", 60)
+        waiter = asyncio.create_task(store.claim("k", "fp", 60))
+        await asyncio.sleep(0.01)
+        await store.release("k")
+        # Claimed again by the waiting request, which now runs normally
+        return await waiter, "k" in store.pending
+    assert asyncio.run(scenario()) == (None, True)
+
+def test_memory_store_rejects_a_key_reused_for_another_request():
+    async def scenario():
+        store = MemoryStore()
+        await store.claim("k", "fp", 60)
+        await store.complete("k", stored(), 60)
+        await store.claim("k", "other", 60)
+    with pytest.raises(IdempotencyError) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+
+def test_memory_store_forgets_expired_and_evicted_keys():
+    store = MemoryStore(max_entries=2)
+    store.remember("old", stored(), 0)
+    assert store.cached("old") is None
+    for key in ("a", "b", "c"):
+        store.remember(key, stored(), 60)
+    assert store.cached("a") is None
+    assert store.cached("c") == stored()
+
+def test_database_store_conflict_is_answered_from_the_committed_row():
+    async def scenario():
+        first, second = DatabaseStore(), DatabaseStore()
+        # Two workers both find the key free
+        assert await first.claim("race", "fp", 60) is None
+        assert await second.claim("race", "fp", 60) is None
+        async with AsyncSessionLocal() as db:
+            first.record(db, "race", stored(b"first"), 60)
+            await db.commit()
+        await first.complete("race", stored(b"first"), 60)
+        async with AsyncSessionLocal() as db:
+            second.record(db, "race", stored(b"second"), 60)
+            with pytest.raises(IntegrityError):
+                await db.commit()
+        replay = await second.lookup("race")
+        await second.release("race")
+        # A third worker answers from the table without running the request
+        return replay, await DatabaseStore().claim("race", "fp", 60)
+    try:
+        assert asyncio.run(scenario()) == (stored(b"first"), stored(b"first"))
+    finally:
+        asyncio.run(async_engine.dispose())
+
+def test_repeated_key_replays_the_first_response(client):
+    headers = {"Idempotency-Key": "booking-1"}
+    first = client.post("/reservations", json=BOOKING, headers=headers)
+    again = client.post("/reservations", json=BOOKING, headers=headers)
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert reservation_count() == 1
+
+def test_key_reused_for_different_details_is_rejected(client):
+    headers = {"Idempotency-Key": "booking-2"}
+    assert client.post("/reservations", json=BOOKING, headers=headers).status_code == 200
+    response = client.post("/reservations", json={**BOOKING, "guests": 4}, headers=headers)
+    assert response.status_code == 422
+    assert reservation_count() == 1
+
+def test_key_committed_by_another_worker_is_replayed(client, fresh_store):
+    headers = {"Idempotency-Key": "booking-3"}
+    first = client.post("/reservations", json=BOOKING, headers=headers)
+
+    class RacingStore(DatabaseStore):
+        """Misses the row on claim, as if the other worker committed just after"""
+        async def claim(self, key, request_fingerprint, ttl):
+            await MemoryStore.claim(self, key, request_fingerprint, ttl)
+            return None
+
+    fresh_store(RacingStore())
+    again = client.post("/reservations", json=BOOKING, headers=headers)
+    assert again.status_code == 200
+    assert again.json() == first.json()
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert reservation_count() == 1
+
+def test_concurrent_requests_with_one_key_book_once(client, fresh_store):
+    fresh_store(DatabaseStore())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/reservations", json=BOOKING, headers={"Idempotency-Key": "booking-4"})
+                for _ in range(10)
+            ))
+    try:
+        responses = asyncio.run(scenario())
+    finally:
+        asyncio.run(async_engine.dispose())
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 9
+    assert reservation_count() == 1
@@ -0,0 +1,28 @@
+"""Building responsive image variants."""
+import asyncio
+import json
+import os
+
+import pytest
+
+import images
+
+pytestmark = pytest.mark.skipif(not images.available_formats(), reason="Pillow without WebP or AVIF support")
+
+def test_build_all_skips_an_unreadable_image(client, tmp_path, capsys):
+    from PIL import Image
+
+    source_dir = tmp_path / "public"
+    (source_dir / "assets" / "images").mkdir(parents=True)
+    Image.new("RGB", (400, 300), "orange").save(source_dir / "assets" / "images" / "good.jpg")
+    (source_dir / "assets" / "images" / "broken.jpg").write_bytes(b"not an image")
+    output_dir = tmp_path / "variants"
+
+    count, _ = asyncio.run(images.build_all(str(source_dir), str(output_dir), "/assets/variants"))
+
+    assert count == 1
+    with open(output_dir / images.MANIFEST) as f:
+        manifest = json.load(f)
+    assert list(manifest) == ["/assets/images/good.jpg"]
+    assert all(os.path.exists(output_dir / variant["url"].rsplit("/", 1)[-1]) for variant in manifest["/assets/images/good.jpg"]["variants"])
+    assert "Could not build variants for /assets/images/broken.jpg" in capsys.readouterr().out
@@ -0,0 +1,105 @@
+"""Re-applying a changed menu.json must not undo admin edits."""
+import json
+
+import pytest
+from sqlalchemy import delete
+
+import bootstrap
+import main
+from bootstrap import ensure_schema, get_metadata, set_metadata, MENU_KEY, MENU_DOCUMENT_KEY
+from database import SessionLocal
+from models import AppMetadataDB, CategoryDB, MenuItemDB
+
+def item(name, price, description="House favourite"):
+    return {"name": name, "price": price, "description": description, "spicy": False, "image_url": None}
+
+def write_menu(data_dir, items):
+    with open(data_dir / "menu.json", "w") as f:
+        json.dump({"categories": [{"name": "Dosas", "items": items}]}, f)
+
+def menu_rows():
+    db = SessionLocal()
+    try:
+        return {row.name: row.price for row in db.query(MenuItemDB).all()}
+    finally:
+        db.close()
+
+def edit_row(name, **values):
+    db = SessionLocal()
+    try:
+        row = db.query(MenuItemDB).filter(MenuItemDB.name == name).one()
+        for field, value in values.items():
+            setattr(row, field, value)
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    ensure_schema()
+    db = SessionLocal()
+    db.execute(delete(MenuItemDB))
+    db.execute(delete(CategoryDB))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(bootstrap, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+def test_only_changed_items_are_applied(data_dir):
+    write_menu(data_dir, [item("Masala", 10.0), item("Plain", 8.0), item("Onion", 9.0), item("Rava", 11.0)])
+    assert main.seed_db()
+    edit_row("Masala", price=12.5)
+    edit_row("Rava", description="Admin wording")
+    db = SessionLocal()
+    db.query(MenuItemDB).filter(MenuItemDB.name == "Onion").delete()
+    db.add(MenuItemDB(name="Admin Special", price=15.0, description="", category_id=db.query(CategoryDB).one().id))
+    db.commit()
+    db.close()
+
+    # Masala and Rava were edited by an admin, Plain was not; Onion was deleted by one
+    write_menu(data_dir, [item("Masala", 10.5), item("Plain", 8.5), item("Onion", 9.5), item("Rava", 11.5), item("Paper", 13.0)])
+    assert main.seed_db(update_menu=True)
+
+    assert menu_rows() == {"Masala": 12.5, "Plain": 8.5, "Rava": 11.0, "Admin Special": 15.0, "Paper": 13.0}
+
+def test_items_dropped_from_file_are_removed_unless_edited(data_dir):
+    write_menu(data_dir, [item("Masala", 10.0), item("Plain", 8.0)])
+    assert main.seed_db()
+    edit_row("Masala", price=12.5)
+
+    write_menu(data_dir, [])
+    assert main.seed_db(update_menu=True)
+
+    assert menu_rows() == {"Masala": 12.5}
+
+def test_unrecorded_menu_is_left_alone(data_dir):
+    write_menu(data_dir, [item("Masala", 10.0)])
+    assert main.seed_db()
+    db = SessionLocal()
+    db.query(AppMetadataDB).filter_by(key=MENU_DOCUMENT_KEY).delete()
+    db.commit()
+    db.close()
+
+    write_menu(data_dir, [item("Masala", 11.0), item("Plain", 8.0)])
+    assert main.seed_db(update_menu=True)
+
+    assert menu_rows() == {"Masala": 10.0}
+    # The file now on disk is what the next change is diffed against
+    assert json.loads(get_metadata(MENU_DOCUMENT_KEY))["categories"][0]["items"][1]["name"] == "Plain"
+
+def test_banner_changes_do_not_reapply_the_menu(data_dir, monkeypatch):
+    write_menu(data_dir, [item("Masala", 10.0)])
+    assert main.seed_db()
+    set_metadata(MENU_KEY, bootstrap.menu_fingerprint())
+    edit_row("Masala", price=12.5)
+    with open(data_dir / "banners.json", "w") as f:
+        json.dump([{"message": "Closed Monday"}], f)
+
+    seeded = []
+    monkeypatch.setattr(main, "seed_and_record", lambda *args, **kwargs: seeded.append(args))
+    summary = main.prepare()
+
+    assert "seeding skipped" in summary
+    assert seeded == []
+    assert menu_rows() == {"Masala": 12.5}
@@ -0,0 +1,80 @@
+"""Migrating a database created by the original schema."""
+import importlib
+from datetime import date, time
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from migrate import run_migrations
+from models import ReservationDB
+
+# reservations as the first release created it, dates and times as free-form text
+BASELINE_RESERVATIONS = """
+CREATE TABLE reservations (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR, email VARCHAR, phone VARCHAR,
+    date VARCHAR, time VARCHAR,
+    guests INTEGER, status VARCHAR, created_at DATETIME,
+    booking_type VARCHAR, event_type VARCHAR, duration VARCHAR,
+    special_requests TEXT, budget VARCHAR, venue VARCHAR
+)
+"""
+LEGACY_ROWS = [
+    # id, date, time, special_requests
+    (1, "2024-03-09", "19:00", None),
+    (2, "2024/03/10", "7:30 PM", "Window seat"),
+    (3, "11.03.2024", "8pm", None),
+    (4, "next friday", "19:00", "Birthday"),
+    (5, "2024-03-12", "dinner time", None),
+    (6, "", None, None),
+]
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with bind.begin() as conn:
+        conn.execute(text(BASELINE_RESERVATIONS))
+        conn.execute(text("CREATE INDEX ix_reservations_id ON reservations (id)"))
+        conn.execute(
+            text("INSERT INTO reservations (id, name, date, time, guests, special_requests) "
+                 "VALUES (:id, 'Guest', :date, :time, 2, :special)"),
+            [{"id": id, "date": date, "time": time, "special": special} for id, date, time, special in LEGACY_ROWS],
+        )
+    yield bind
+    bind.dispose()
+
+def stored_rows(bind):
+    with bind.connect() as conn:
+        return {row.id: (row.date, row.time, row.special_requests) for row in conn.execute(
+            text("SELECT id, date, time, special_requests FROM reservations ORDER BY id")
+        )}
+
+def test_legacy_dates_are_converted_once(legacy_engine):
+    assert run_migrations(legacy_engine) == ["0001_typed_reservation_dates"]
+    converted = stored_rows(legacy_engine)
+
+    assert converted == {
+        1: ("2024-03-09", "19:00:00", None),
+        2: ("2024-03-10", "19:30:00", "Window seat"),
+        3: ("2024-03-11", "20:00:00", None),
+        4: (None, "19:00:00", "Birthday\nOriginal booking date 'next friday'"),
+        5: ("2024-03-12", None, "Original booking time 'dinner time'"),
+        6: (None, None, None),
+    }
+
+    with Session(legacy_engine) as db:
+        booking = db.get(ReservationDB, 2)
+        assert (booking.date, booking.time) == (date(2024, 3, 10), time(19, 30))
+
+    # Recorded, so a second run does nothing
+    assert run_migrations(legacy_engine) == []
+    # And the upgrade itself is safe to repeat, without noting the lost text twice
+    importlib.import_module("migrations.0001_typed_reservation_dates").upgrade(legacy_engine)
+    assert stored_rows(legacy_engine) == converted
+
+def test_migration_adds_the_date_indexes(legacy_engine):
+    run_migrations(legacy_engine)
+    indexes = {index["name"]: index["column_names"] for index in inspect(legacy_engine).get_indexes("reservations")}
+    assert indexes["ix_reservations_date_status"] == ["date", "status"]
+    assert indexes["ix_reservations_date_time"] == ["date", "time"]
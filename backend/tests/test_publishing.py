@@ -0,0 +1,36 @@
+"""Admin edits must stand even when the static artifacts cannot be written."""
+import pytest
+
+import publisher
+from database import SessionLocal
+from models import BannerDB, CategoryDB
+
+@pytest.fixture
+def failing_publisher(monkeypatch):
+    async def fail(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(publisher, "publish_menu", fail)
+    monkeypatch.setattr(publisher, "publish_banners", fail)
+
+def test_menu_edit_is_saved_when_publishing_fails(client, admin_headers, failing_publisher, capsys):
+    response = client.post("/menu/categories", json={"name": "Publishing Test"}, headers=admin_headers)
+    assert response.status_code == 200
+    db = SessionLocal()
+    try:
+        assert db.get(CategoryDB, response.json()["id"]) is not None
+    finally:
+        db.close()
+    assert "Could not publish menu artifacts" in capsys.readouterr().out
+
+def test_banner_edits_are_saved_when_publishing_fails(client, admin_headers, failing_publisher):
+    created = client.post("/banners", json={"message": "Closed Monday", "active": True}, headers=admin_headers)
+    assert created.status_code == 200
+    banner_id = created.json()["id"]
+    updated = client.put(f"/banners/{banner_id}", json={"message": "Closed Tuesday", "active": True}, headers=admin_headers)
+    assert updated.status_code == 200
+    db = SessionLocal()
+    try:
+        assert db.get(BannerDB, banner_id).message == "Closed Tuesday"
+    finally:
+        db.close()
+    assert client.delete(f"/banners/{banner_id}", headers=admin_headers).status_code == 200
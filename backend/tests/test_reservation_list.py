@@ -0,0 +1,43 @@
+"""The admin reservation list is private and always paged."""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from database import SessionLocal
+from models import ReservationDB
+from routers.reservations import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+@pytest.fixture
+def reservations(client):
+    db = SessionLocal()
+    db.execute(delete(ReservationDB))
+    started = datetime(2030, 1, 1)
+    db.add_all(
+        ReservationDB(name=f"Guest {n}", email="guest@example.com", phone="613-555-0100",
+                      date=date(2030, 6, 1), time=time(19, 0), guests=2, created_at=started + timedelta(seconds=n))
+        for n in range(DEFAULT_PAGE_SIZE + 5)
+    )
+    db.commit()
+    db.close()
+    yield
+    db = SessionLocal()
+    db.execute(delete(ReservationDB))
+    db.commit()
+    db.close()
+
+def test_list_requires_admin(client, reservations):
+    assert client.get("/reservations").status_code == 401
+
+def test_list_defaults_to_one_page(client, reservations, admin_headers):
+    response = client.get("/reservations", headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == DEFAULT_PAGE_SIZE
+
+    rest = client.get("/reservations", headers=admin_headers, params={"cursor": response.headers["X-Next-Cursor"]})
+    assert len(rest.json()) == 5
+    assert "X-Next-Cursor" not in rest.headers
+
+def test_list_limit_is_capped(client, reservations, admin_headers):
+    response = client.get("/reservations", headers=admin_headers, params={"limit": MAX_PAGE_SIZE + 1})
+    assert response.status_code == 422
@@ -59,7 +59,7 @@ function App() {
     };
     const fetchBanners = async () => {
       try {
-        const res = await axios.get(`${API_URL}/banners`);
+        const res = await axios.get(`${API_URL}/banners`, { params: { active: true } });
         setBanners(res.data);
       } catch (err) {
         console.error('Fetch banners error:', err);
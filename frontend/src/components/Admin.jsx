@@ -1,16 +1,24 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { Shield, Plus, Package, Edit, Trash2, CalendarCheck, LogOut, Megaphone, Check, XCircle, CalendarDays } from 'lucide-react';
 import axios from 'axios';
 import CalendarView from './CalendarView';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+const PAGE_SIZE = 50;
 
 function Admin() {
     const [isAuthenticated, setIsAuthenticated] = useState(false);
     const [password, setPassword] = useState('');
     const [token, setToken] = useState(localStorage.getItem('adminToken') || '');
     const [reservations, setReservations] = useState([]);
+    const [statusFilter, setStatusFilter] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    // Read by the event stream listener, which outlives the render it was created in
+    const statusFilterRef = useRef(statusFilter);
+    statusFilterRef.current = statusFilter;
+    // Bumped whenever reservations change, so the calendar reloads its summary
+    const [reservationsVersion, setReservationsVersion] = useState(0);
     const [menu, setMenu] = useState({ categories: [] });
     const [banners, setBanners] = useState([]);
     const [activeTab, setActiveTab] = useState('reservations');
@@ -39,22 +47,77 @@ function Admin() {
 
     useEffect(() => {
         if (isAuthenticated) {
-            fetchReservations();
             fetchMenu();
             fetchBanners();
         }
     }, [isAuthenticated]);
 
+    useEffect(() => {
+        if (isAuthenticated) {
+            fetchReservations();
+        }
+    }, [isAuthenticated, statusFilter]);
+
     // Create axios instance with auth header
     const getAuthHeaders = () => ({
         headers: { Authorization: `Bearer ${token}` }
     });
 
-    const fetchReservations = async () => {
+    // Live updates: EventSource cannot send the Authorization header, so it connects
+    // with a short-lived stream token and fetches a new one whenever it has to reconnect
+    useEffect(() => {
+        if (!isAuthenticated) return;
+        let source = null;
+        let retryTimer = null;
+        let stopped = false;
+
+        const connect = async () => {
+            try {
+                const res = await axios.post(`${API_URL}/reservations/events/token`, null, getAuthHeaders());
+                if (stopped) return;
+                source = new EventSource(`${API_URL}/reservations/events?token=${encodeURIComponent(res.data.token)}`);
+                ['created', 'status_changed', 'deleted', 'archived'].forEach(name =>
+                    source.addEventListener(name, () => fetchReservations())
+                );
+                source.onerror = () => {
+                    // The browser retries a dropped stream with the same URL; once it gives up
+                    // (the token has expired by then) start over with a new token
+                    if (source.readyState === EventSource.CLOSED) {
+                        retryTimer = setTimeout(connect, 3000);
+                    }
+                };
+            } catch (err) {
+                if (err.response?.status === 401) {
+                    handleLogout();
+                    return;
+                }
+                if (!stopped) retryTimer = setTimeout(connect, 10000);
+            }
+        };
+
+        connect();
+        return () => {
+            stopped = true;
+            clearTimeout(retryTimer);
+            if (source) source.close();
+        };
+    }, [isAuthenticated, token]);
+
+    // Newest first, one page at a time; without a cursor the list starts over
+    const fetchReservations = async (cursor = null) => {
         try {
-            const res = await axios.get(`${API_URL}/reservations`);
-            setReservations(res.data);
+            const params = { limit: PAGE_SIZE, order: 'desc' };
+            if (statusFilterRef.current) params.status = statusFilterRef.current;
+            if (cursor) params.cursor = cursor;
+            const res = await axios.get(`${API_URL}/reservations`, { params, ...getAuthHeaders() });
+            setReservations(prev => (cursor ? [...prev, ...res.data] : res.data));
+            setNextCursor(res.headers['x-next-cursor'] || null);
+            if (!cursor) setReservationsVersion(version => version + 1);
         } catch (err) {
+            if (err.response?.status === 401) {
+                handleLogout();
+                return;
+            }
             console.error(err);
         }
     };
@@ -350,6 +413,21 @@ function Admin() {
 
                 {activeTab === 'reservations' && (
                     <div className="bg-white rounded-xl shadow-lg border border-primary/10 overflow-hidden">
+                        <div className="flex justify-end items-center gap-2 px-4 py-3 border-b border-primary/10">
+                            <label htmlFor="status-filter" className="text-xs font-bold text-primary/60 uppercase">Status</label>
+                            <select
+                                id="status-filter"
+                                value={statusFilter}
+                                onChange={(e) => setStatusFilter(e.target.value)}
+                                className="px-3 py-1.5 rounded-lg border border-primary/20 text-sm focus:outline-none focus:border-accent"
+                            >
+                                <option value="">All</option>
+                                <option value="pending">Pending</option>
+                                <option value="confirmed">Confirmed</option>
+                                <option value="rejected">Rejected</option>
+                                <option value="cancelled">Cancelled</option>
+                            </select>
+                        </div>
                         <div className="overflow-x-auto">
                             <table className="w-full text-left">
                                 <thead className="bg-gray-50 border-b border-primary/20 text-xs text-primary uppercase tracking-wider">
@@ -377,7 +455,7 @@ function Admin() {
 
                                         return (
                                             <motion.tr
-                                                key={i}
+                                                key={res.id}
                                                 initial={{ opacity: 0 }}
                                                 animate={{ opacity: 1 }}
                                                 transition={{ delay: i * 0.05 }}
@@ -473,12 +551,23 @@ function Admin() {
                                 </tbody>
                             </table>
                         </div>
+                        {nextCursor && (
+                            <div className="flex justify-center py-4 border-t border-primary/10">
+                                <button
+                                    onClick={() => fetchReservations(nextCursor)}
+                                    className="px-4 py-2 rounded-lg bg-gray-100 text-primary text-sm font-bold hover:bg-gray-200 transition-colors"
+                                >
+                                    Load more
+                                </button>
+                            </div>
+                        )}
                     </div>
                 )}
 
                 {activeTab === 'calendar' && (
                     <CalendarView
-                        reservations={reservations}
+                        token={token}
+                        refreshKey={reservationsVersion}
                         onDelete={handleDeleteReservation}
                     />
                 )}
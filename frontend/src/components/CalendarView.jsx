@@ -5,14 +5,46 @@ import axios from 'axios';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
-function CalendarView({ reservations, onDelete }) {
+function CalendarView({ token, refreshKey, onDelete }) {
     const [currentDate, setCurrentDate] = useState(new Date());
     const [selectedBooking, setSelectedBooking] = useState(null);
     const [calendarDays, setCalendarDays] = useState([]);
+    const [summary, setSummary] = useState({});
+    const [selectedDay, setSelectedDay] = useState(null);
+    const [dayBookings, setDayBookings] = useState([]);
+
+    const monthKey = `${currentDate.getFullYear()}-${String(currentDate.getMonth() + 1).padStart(2, '0')}`;
+    const authHeaders = { Authorization: `Bearer ${token}` };
+
+    // One request per month: booking counts per day, type and status instead of every reservation
+    useEffect(() => {
+        let cancelled = false;
+        axios.get(`${API_URL}/reservations/calendar`, { params: { month: monthKey }, headers: authHeaders })
+            .then(res => {
+                if (!cancelled) setSummary(Object.fromEntries(res.data.days.map(day => [day.date, day])));
+            })
+            .catch(err => console.error(err));
+        return () => { cancelled = true; };
+    }, [monthKey, token, refreshKey]);
+
+    // The bookings themselves are only loaded for the day being looked at
+    useEffect(() => {
+        if (!selectedDay) {
+            setDayBookings([]);
+            return;
+        }
+        let cancelled = false;
+        axios.get(`${API_URL}/reservations/calendar/${selectedDay}`, { params: { status: 'confirmed' }, headers: authHeaders })
+            .then(res => {
+                if (!cancelled) setDayBookings(res.data);
+            })
+            .catch(err => console.error(err));
+        return () => { cancelled = true; };
+    }, [selectedDay, token, refreshKey]);
 
     useEffect(() => {
         generateCalendar();
-    }, [currentDate, reservations]);
+    }, [currentDate, summary]);
 
     const generateCalendar = () => {
         const year = currentDate.getFullYear();
@@ -30,13 +62,11 @@ function CalendarView({ reservations, onDelete }) {
             days.push({ date: null, bookings: [] });
         }
 
-        // Add days of the month with their bookings
+        // Add days of the month with their confirmed bookings, counted per booking type
         for (let day = 1; day <= monthLength; day++) {
             const dateStr = `${year}-${String(month + 1).padStart(2, '0')}-${String(day).padStart(2, '0')}`;
-            const dayBookings = reservations.filter(res => 
-                res.status === 'confirmed' && res.date === dateStr
-            );
-            days.push({ date: day, dateStr, bookings: dayBookings });
+            const counts = (summary[dateStr]?.breakdown || []).filter(bucket => bucket.status === 'confirmed');
+            days.push({ date: day, dateStr, counts });
         }
 
         setCalendarDays(days);
@@ -44,10 +74,12 @@ function CalendarView({ reservations, onDelete }) {
 
     const previousMonth = () => {
         setCurrentDate(new Date(currentDate.getFullYear(), currentDate.getMonth() - 1));
+        setSelectedDay(null);
     };
 
     const nextMonth = () => {
         setCurrentDate(new Date(currentDate.getFullYear(), currentDate.getMonth() + 1));
+        setSelectedDay(null);
     };
 
     const getBookingIcon = (bookingType) => {
@@ -151,9 +183,10 @@ function CalendarView({ reservations, onDelete }) {
                             initial={{ opacity: 0 }}
                             animate={{ opacity: 1 }}
                             transition={{ delay: index * 0.01 }}
+                            onClick={() => day.date && setSelectedDay(day.dateStr)}
                             className={`min-h-[100px] p-2 rounded-lg border ${
                                 day.date 
-                                    ? 'bg-white border-primary/20 hover:border-accent/50 transition-colors' 
+                                    ? `bg-white cursor-pointer hover:border-accent/50 transition-colors ${selectedDay === day.dateStr ? 'border-accent' : 'border-primary/20'}`
                                     : 'bg-gray-50 border-transparent'
                             }`}
                         >
@@ -163,15 +196,14 @@ function CalendarView({ reservations, onDelete }) {
                                         {day.date}
                                     </div>
                                     <div className="space-y-1">
-                                        {day.bookings.map((booking, idx) => (
-                                            <button
+                                        {day.counts.map((bucket, idx) => (
+                                            <div
                                                 key={idx}
-                                                onClick={() => setSelectedBooking(booking)}
-                                                className={`w-full text-left px-2 py-1 rounded text-[10px] font-medium flex items-center gap-1 transition-all ${getBookingColor(booking.booking_type)}`}
+                                                className={`w-full px-2 py-1 rounded text-[10px] font-medium flex items-center gap-1 ${getBookingColor(bucket.booking_type)}`}
                                             >
-                                                {getBookingIcon(booking.booking_type)}
-                                                <span className="truncate">{booking.time} - {booking.name}</span>
-                                            </button>
+                                                {getBookingIcon(bucket.booking_type)}
+                                                <span className="truncate">{bucket.count} · {bucket.guests} pax</span>
+                                            </div>
                                         ))}
                                     </div>
                                 </>
@@ -181,6 +213,36 @@ function CalendarView({ reservations, onDelete }) {
                 </div>
             </div>
 
+            {/* Confirmed bookings of the selected day */}
+            {selectedDay && (
+                <div className="bg-white rounded-xl shadow-lg border border-primary/10 p-6">
+                    <div className="flex items-center justify-between mb-4">
+                        <h4 className="text-lg font-bold text-primary">{selectedDay}</h4>
+                        <button
+                            onClick={() => setSelectedDay(null)}
+                            className="p-2 hover:bg-gray-100 rounded-full transition-colors"
+                        >
+                            <X size={18} />
+                        </button>
+                    </div>
+                    <div className="space-y-2">
+                        {dayBookings.map(booking => (
+                            <button
+                                key={booking.id}
+                                onClick={() => setSelectedBooking(booking)}
+                                className={`w-full text-left px-3 py-2 rounded-lg text-sm font-medium flex items-center gap-2 transition-all ${getBookingColor(booking.booking_type)}`}
+                            >
+                                {getBookingIcon(booking.booking_type)}
+                                <span className="truncate">{booking.time} - {booking.name} ({booking.guests} guests)</span>
+                            </button>
+                        ))}
+                        {dayBookings.length === 0 && (
+                            <p className="text-sm text-primary/60 italic">No confirmed bookings on this day.</p>
+                        )}
+                    </div>
+                </div>
+            )}
+
             {/* Booking Details Modal */}
             <AnimatePresence>
                 {selectedBooking && (
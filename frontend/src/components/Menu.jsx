@@ -137,13 +137,23 @@ function Menu({ categories, isLoading }) {
                                     >
                                         <div className="absolute top-0 right-0 h-full w-1 bg-accent opacity-0 group-hover:opacity-100 transition-opacity" />
 
-                                        {item.image && (
+                                        {(item.image_url || item.image) && (
                                             <div className="w-full sm:w-32 h-32 rounded-xl overflow-hidden flex-shrink-0 shadow-inner bg-background-light">
-                                                <img
-                                                    src={item.image}
-                                                    alt={item.name}
-                                                    className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700"
-                                                />
+                                                <picture className="block w-full h-full">
+                                                    {/* Resized AVIF/WebP variants from the API, the original is the fallback */}
+                                                    {Object.entries(item.images?.srcset || {}).map(([format, srcset]) => (
+                                                        <source key={format} type={`image/${format}`} srcSet={srcset} sizes="(min-width: 640px) 128px, 100vw" />
+                                                    ))}
+                                                    <img
+                                                        src={item.image_url || item.image}
+                                                        alt={item.name}
+                                                        width={item.images?.width}
+                                                        height={item.images?.height}
+                                                        loading="lazy"
+                                                        decoding="async"
+                                                        className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700"
+                                                    />
+                                                </picture>
                                             </div>
                                         )}
                                         <div className="flex-1 flex flex-col justify-center">
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import { motion } from 'framer-motion';
 import { Clock, Calendar, Users, Send, CheckCircle2, MapPin, Phone, Mail, ChevronLeft, ChevronRight, Navigation, Utensils, PartyPopper } from 'lucide-react';
 import axios from 'axios';
@@ -6,6 +6,18 @@ import LoadingIcon from './LoadingIcon';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// crypto.randomUUID only exists on secure origins and in Safari 15.4+
+const newIdempotencyKey = () => {
+    if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+        return crypto.randomUUID();
+    }
+    if (typeof crypto !== 'undefined' && typeof crypto.getRandomValues === 'function') {
+        const bytes = crypto.getRandomValues(new Uint8Array(16));
+        return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+};
+
 function Reservations() {
     const [status, setStatus] = useState('idle'); // idle, loading, success, error
     const [formData, setFormData] = useState({
@@ -22,14 +34,22 @@ function Reservations() {
         event_type: ''
     });
 
+    // Resubmitting the same details reuses the key, so a retry never books twice
+    const pendingSubmission = useRef(null);
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         setStatus('loading');
+        const payload = { ...formData, guests: parseInt(formData.guests) };
+        const serialized = JSON.stringify(payload);
         try {
-            await axios.post(`${API_URL}/reservations/`, {
-                ...formData,
-                guests: parseInt(formData.guests)
+            if (pendingSubmission.current?.payload !== serialized) {
+                pendingSubmission.current = { payload: serialized, key: newIdempotencyKey() };
+            }
+            await axios.post(`${API_URL}/reservations/`, payload, {
+                headers: { 'Idempotency-Key': pendingSubmission.current.key }
             });
+            pendingSubmission.current = null;
             setStatus('success');
         } catch (error) {
             console.error('Reservation error:', error);
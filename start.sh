@@ -19,12 +19,25 @@ echo "----------------------------------------"
 
 # Cleanup conflicting processes
 echo "-> Cleaning up existing processes..."
-lsof -ti :8000,5173 | xargs kill -9 2>/dev/null || true
-pkill -f "vite" 2>/dev/null || true
+# Ask nicely first so in-flight requests finish and queued bookings are committed
+stop_gracefully() {
+    local pids="$1"
+    [ -z "$pids" ] && return
+    kill -TERM $pids 2>/dev/null || true
+    for _ in $(seq 1 10); do
+        kill -0 $pids 2>/dev/null || return
+        sleep 1
+    done
+    echo "   still running after 10s, forcing"
+    kill -9 $pids 2>/dev/null || true
+}
+stop_gracefully "$(lsof -ti :8000,5173)"
+stop_gracefully "$(pgrep -f vite)"
 
 # Start Backend
 echo "-> Launching FastAPI Backend..."
-(cd backend && ./venv/bin/python main.py) &
+# Vite serves frontend/public live, so variants built on menu edits are reachable
+(cd backend && IMAGE_VARIANTS_URL=/assets/variants ./venv/bin/python main.py) &
 
 # Start Frontend
 echo "-> Launching Vite Frontend..."